@@ -0,0 +1,21 @@
+from dataclasses import asdict, dataclass
+
+@dataclass(slots=True)
+class Alerta:
+    """
+    Registro de una alerta, con el mismo esquema para todas las fuentes.
+
+    Con slots cada instancia ocupa menos memoria que un dict, no admite claves sueltas y se
+    serializa de forma compacta al volver del pool de procesos.
+    """
+    url: str | None
+    titulo: str
+    fecha: str
+    pais: str
+    institucion: str
+    pdf: str | None = None
+    categoria: str | None = None
+    resumen: str | None = None
+
+    def a_dict(self):
+        return asdict(self)
@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import time
+from urllib.parse import urlparse
+import host_health
+import http_client
+import metrics
+import parse_pool
+
+# Límites de concurrencia
+MAX_CONCURRENCIA_GLOBAL = 16   # Requests simultáneos en todo el run
+MAX_CONCURRENCIA_POR_HOST = 4  # Requests simultáneos contra un mismo sitio
+
+# Ritmo de los sitios que piden más cortesía: (segundos mínimos entre inicios de requests, máximo en vuelo).
+# Reemplaza las pausas fijas que cada scraper hacía después de cada categoría o detalle, que no
+# espaciaban nada (todas las corrutinas pedían a la vez) y sumaban su duración a la del scraper
+RITMO_POR_HOST = {
+    'www.argentina.gob.ar': (0.2, 3),
+    'www.ministeriodesalud.go.cr': (0.2, 2),
+    'www.digemid.minsa.gob.pe': (0.1, 3)
+}
+
+# Listados con validadores nuevos pedidos por el scraper en curso (cada scraper corre en su tarea)
+_listados_scraper = contextvars.ContextVar('listados_scraper', default=None)
+
+class RitmoHost:
+    """
+    Cortesía con un host: como mucho `max_en_vuelo` requests a la vez y al menos `espaciado`
+    segundos entre el inicio de uno y el siguiente. Los turnos se reparten en orden de llegada,
+    así varias categorías del mismo sitio se piden en paralelo pero escalonadas.
+    """
+
+    def __init__(self, espaciado=0.0, max_en_vuelo=MAX_CONCURRENCIA_POR_HOST):
+        self.espaciado = espaciado
+        self._semaforo = asyncio.Semaphore(max_en_vuelo)
+        self._proximo_turno = 0.0
+
+    async def __aenter__(self):
+        await self._semaforo.acquire()
+        # Sin await entre leer y reservar el turno: ninguna otra corrutina puede tomar el mismo
+        ahora = time.monotonic()
+        turno = max(ahora, self._proximo_turno)
+        self._proximo_turno = turno + self.espaciado
+        if turno > ahora:
+            try:
+                await asyncio.sleep(turno - ahora)
+            except BaseException:
+                self._semaforo.release()
+                raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaforo.release()
+
+class AsyncEngine:
+    """
+    Motor asíncrono de scraping: una sesión HTTP async compartida por todos los scrapers,
+    con un tope global de concurrencia y un ritmo por host (RitmoHost) para no saturar los sitios.
+    """
+
+    def __init__(self, max_global=MAX_CONCURRENCIA_GLOBAL, max_por_host=MAX_CONCURRENCIA_POR_HOST, cache=None):
+        self.max_global = max_global
+        self.max_por_host = max_por_host
+        self.cache = cache
+        self._semaforo_global = None
+        self._ritmos_host = {}
+        self._session = None
+
+    async def __aenter__(self):
+        self._semaforo_global = asyncio.Semaphore(self.max_global)
+        self._session = http_client.crear_sesion_async(max_clients=self.max_global)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    def _ritmo_host(self, host):
+        if host not in self._ritmos_host:
+            espaciado, max_en_vuelo = RITMO_POR_HOST.get(host, (0.0, self.max_por_host))
+            self._ritmos_host[host] = RitmoHost(espaciado, min(max_en_vuelo, self.max_por_host))
+        return self._ritmos_host[host]
+
+    async def get(self, url, tipo='listado', **kwargs):
+        """
+        GET asíncrono respetando el ritmo del host y el tope global.
+        Pasa por el circuit breaker del host y reintenta con backoff las fallas transitorias
+        (la espera entre intentos no ocupa lugar en los semáforos).
+
+        Raises:
+            host_health.HostNoDisponible: Si el circuito del host está abierto
+        """
+        host = urlparse(url).netloc
+        salud = host_health.obtener_salud()
+        opciones = salud.preparar(host, http_client.opciones_request(url, tipo, **kwargs))
+
+        try:
+            for intento in range(host_health.MAX_REINTENTOS + 1):
+                response, error = None, None
+                try:
+                    # Primero el turno del host: esperarlo no retiene un lugar del tope global
+                    async with self._ritmo_host(host), self._semaforo_global:
+                        with metrics.span('http', host=host, tipo=tipo) as span:
+                            response = await self._session.get(http_client.resolver_url(url), **opciones)
+                            http_client.anotar_respuesta(span, url, response)
+                except Exception as e:
+                    error = e
+
+                if intento == host_health.MAX_REINTENTOS or not host_health.es_transitoria(response, error):
+                    break
+                metrics.contar('http_reintentos', host=host)
+                await asyncio.sleep(host_health.espera_reintento(intento, response))
+        except asyncio.CancelledError:
+            # La tarea se canceló (p. ej. falló otra rama del mismo gather): sin resultado que registrar
+            salud.cancelar(host)
+            raise
+
+        salud.registrar(host, response, error)
+        if error is not None:
+            raise error
+        return response
+
+    async def get_condicional(self, url, tipo='listado', **kwargs):
+        """
+        GET condicional para listados y feeds
+
+        Returns:
+            Response o None si la fuente no cambió desde el último run (304 o mismo hash)
+        """
+        if self.cache is None:
+            return await self.get(url, tipo, **kwargs)
+
+        headers = {**self.cache.cabeceras(url), **kwargs.pop('headers', {})}
+        response = await self.get(url, tipo, headers=headers, **kwargs)
+
+        if self.cache.sin_cambios(url, response):
+            metrics.contar('http_sin_cambios', host=urlparse(url).netloc)
+            print(f"    [=] Sin cambios: {url}")
+            return None
+
+        listados = _listados_scraper.get()
+        if listados is not None:
+            listados.append(url)
+        return response
+
+    async def parsear(self, funcion, *args, listado=None):
+        """
+        Parsea contenido ya descargado, en el pool de procesos si está habilitado
+
+        Args:
+            listado: URL pedida con get_condicional cuyo contenido se parsea; si el parseo termina
+                bien se confirman sus validadores, si falla el próximo run lo vuelve a parsear
+        """
+        with metrics.span('parseo', funcion=funcion.__name__):
+            resultado = await parse_pool.ejecutar_async(funcion, *args)
+        if listado is not None and self.cache is not None:
+            self.cache.confirmar(listado)
+        return resultado
+
+    def descartar(self, *urls):
+        """Olvida los validadores de listados ya parseados cuyas noticias el scraper no va a devolver"""
+        if self.cache is not None:
+            self.cache.descartar(urls)
+
+async def _ejecutar_scraper(scraper, engine, urls_conocidas):
+    listados = []
+    _listados_scraper.set(listados)
+    with metrics.span('scraper', fuente=scraper.__name__) as span:
+        try:
+            resultado = await scraper(engine, urls_conocidas)
+        except BaseException:
+            # Cortado por el plazo o falló: sus listados se vuelven a parsear en el próximo run
+            engine.descartar(*listados)
+            raise
+        span.datos['alertas'] = len(resultado or [])
+        return resultado
+
+async def _recolectar(engine, scrapers, urls_conocidas, plazo):
+    noticias_candidatas = []
+
+    # Todos los scrapers corren como tareas sobre el mismo motor
+    tareas = [asyncio.create_task(_ejecutar_scraper(scraper, engine, urls_conocidas)) for scraper in scrapers]
+    _, pendientes = await asyncio.wait(tareas, timeout=plazo)
+
+    for tarea in pendientes:
+        tarea.cancel()
+    await asyncio.gather(*pendientes, return_exceptions=True)
+
+    for scraper, tarea in zip(scrapers, tareas):
+        if tarea.cancelled():
+            metrics.contar('scrapers_fuera_de_plazo', fuente=scraper.__name__)
+            print(f"  -> [!] {scraper.__name__} no terminó en el plazo de {plazo:.0f}s, se reintenta en el próximo run")
+        elif tarea.exception() is not None:
+            print(f"  -> [ERROR CRÍTICO] {scraper.__name__} falló inesperadamente: {tarea.exception()}")
+        elif tarea.result():
+            noticias_candidatas.extend(tarea.result())
+
+    return noticias_candidatas
+
+async def _ejecutar_scrapers(scrapers, cache, urls_conocidas, engine, plazo):
+    if engine is None:
+        async with AsyncEngine(cache=cache) as engine:
+            return await _recolectar(engine, scrapers, urls_conocidas, plazo)
+
+    # Motor de larga vida (modo daemon): la sesión queda abierta entre ciclos
+    engine.cache = cache
+    return await _recolectar(engine, scrapers, urls_conocidas, plazo)
+
+def ejecutar_scrapers(scrapers, cache=None, urls_conocidas=frozenset(), engine=None, runner=None, plazo=None):
+    """
+    Ejecuta todos los scrapers en un event loop y consolida sus resultados
+
+    Args:
+        scrapers: Lista de corrutinas scrape_* que reciben el motor
+        cache: CacheValidadores opcional para pedir los listados con GET condicional
+        urls_conocidas: URLs ya presentes en el historial, no se enriquecen ni se devuelven
+        engine: AsyncEngine ya abierto para reutilizar su sesión; por defecto se abre uno por llamada
+        runner: asyncio.Runner cuyo event loop se reutiliza (obligatorio junto con engine)
+        plazo: Segundos máximos; los scrapers que no terminan a tiempo se cancelan y no aportan
+            noticias (ni validadores al cache, así el próximo run los vuelve a parsear). Lo mismo
+            con los que lanzan una excepción
+
+    Returns:
+        list: Noticias candidatas de todas las fuentes
+    """
+    ejecutar = runner.run if runner else asyncio.run
+    return ejecutar(_ejecutar_scrapers(scrapers, cache, urls_conocidas, engine, plazo))
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+from history_store import abrir_historial
+from pipeline import procesar_novedades
+import metrics
+
+# Tamaño de cada tanda de re-resumen (se procesa como una ráfaga de novedades, en lotes para Gemini)
+MAX_ALERTAS_POR_TANDA = int(os.environ.get('BACKFILL_TANDA', 20))
+
+# Una alerta que sigue sin resumen (enlace caído, PDF escaneado) se reintenta pocas veces y espaciadas
+MAX_INTENTOS = 3
+ESPERA_ENTRE_INTENTOS_HORAS = 24
+
+# En modo daemon solo se aprovechan los huecos entre ciclos de al menos este largo,
+# dejando un margen para que el próximo ciclo empiece a horario
+VENTANA_MINIMA_SEGUNDOS = 120
+MARGEN_SEGUNDOS = 30
+
+PLAZO_DEFECTO_SEGUNDOS = 120
+
+def ejecutar_backfill(plazo=PLAZO_DEFECTO_SEGUNDOS, limitador=None, runner=None, max_alertas=MAX_ALERTAS_POR_TANDA):
+    """
+    Re-resume una tanda de alertas del historial que quedaron con el título como resumen (o sin
+    resumen) porque falló la extracción o Gemini. Usa el mismo pipeline que las novedades pero sin
+    notificar, y actualiza las filas en el lugar.
+
+    Args:
+        plazo: Segundos disponibles; no se empiezan extracciones ni resúmenes pasado ese tiempo
+        limitador: LimitadorGemini compartido (en modo daemon, el mismo de los ciclos)
+        runner: asyncio.Runner del modo daemon (obligatorio junto con un limitador compartido)
+        max_alertas: Tamaño de la tanda
+
+    Returns:
+        int: Cantidad de resúmenes actualizados
+    """
+    limite = time.monotonic() + plazo
+    with abrir_historial() as historial:
+        alertas = historial.sin_resumen(max_alertas, MAX_INTENTOS, ESPERA_ENTRE_INTENTOS_HORAS)
+        if not alertas:
+            return 0
+
+        print(f"\n[backfill] Re-resumiendo {len(alertas)} alertas sin resumen propio (plazo {plazo:.0f}s)")
+        # Importaciones pesadas solo si hay trabajo (igual que en el flujo principal)
+        from content_extractor import extract_content
+        from gemini_service import generar_resumen, generar_resumenes_lote, resumen_en_cache
+
+        # Sin resumen previo: el pipeline manda directo al envío las alertas que ya traen uno
+        for alerta in alertas:
+            alerta.resumen = None
+
+        with metrics.span('backfill') as span:
+            procesadas = procesar_novedades(
+                alertas,
+                extraer=extract_content,
+                resumir=generar_resumen,
+                notificar=lambda alerta: None,
+                resumir_lote=generar_resumenes_lote,
+                buscar_en_cache=resumen_en_cache,
+                limitador=limitador,
+                runner=runner,
+                limite=limite
+            )
+            actualizadas = historial.registrar_resumenes(procesadas)
+            span.datos.update(alertas=len(alertas), intentadas=len(procesadas), actualizadas=actualizadas)
+
+    metrics.contar('backfill_resumenes', actualizadas, resultado='actualizado')
+    metrics.contar('backfill_resumenes', len(procesadas) - actualizadas, resultado='sin_resumen')
+    print(f"[backfill] {actualizadas}/{len(procesadas)} resúmenes actualizados "
+          f"({len(alertas) - len(procesadas)} quedan para otra tanda)")
+    return actualizadas
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv, find_dotenv
+    from run_budget import BloqueoRun
+
+    load_dotenv(find_dotenv(), override=True)
+
+    parser = argparse.ArgumentParser(description="Re-resume las alertas del historial que quedaron sin resumen")
+    parser.add_argument('--plazo', type=float, default=PLAZO_DEFECTO_SEGUNDOS, help="Segundos disponibles")
+    parser.add_argument('--max', type=int, default=MAX_ALERTAS_POR_TANDA, help="Alertas por tanda")
+    args = parser.parse_args()
+
+    # Nunca en paralelo con un run del scraper: se espera al próximo hueco
+    with BloqueoRun() as bloqueo:
+        if not bloqueo.adquirir():
+            print("[!] Hay una ejecución del scraper en curso, se omite el backfill")
+            sys.exit(0)
+        try:
+            ejecutar_backfill(args.plazo, max_alertas=args.max)
+        finally:
+            metrics.METRICAS.volcar()
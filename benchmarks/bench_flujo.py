@@ -0,0 +1,213 @@
+"""
+Benchmark de punta a punta de ejecutar_flujo contra el servidor de replay (sin red ni APIs reales).
+
+Cada escenario corre en un proceso nuevo, con el historial y los caches en un directorio temporal:
+el historial se precarga con todas las alertas de los fixtures salvo las `novedades` del escenario.
+Reporta el tiempo total, el tiempo por etapa y las alertas procesadas por minuto.
+
+Uso:
+    python benchmarks/bench_flujo.py                        # todos los escenarios
+    python benchmarks/bench_flujo.py --escenario rafaga_50  # uno solo
+    python benchmarks/bench_flujo.py --escenario rafaga_50 --verboso  # con la salida del flujo
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIR_BENCHMARKS)
+sys.path.insert(0, DIR_BENCHMARKS)
+
+from replay_server import ESCENARIOS, PUERTO_DEFECTO, config_escenario
+
+ESPERA_ARRANQUE_SEGUNDOS = 15
+
+class Cronometro:
+    """Tiempo acumulado y cantidad de llamadas por etapa (las etapas concurrentes suman sus hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas = {}
+
+    def envolver(self, modulo, nombre, etapa):
+        funcion = getattr(modulo, nombre)
+
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                with self._lock:
+                    segundos, llamadas = self.etapas.get(etapa, (0.0, 0))
+                    self.etapas[etapa] = (segundos + time.perf_counter() - inicio, llamadas + 1)
+
+        setattr(modulo, nombre, medida)
+
+def alertas_de_fixtures():
+    """Alertas que producen los listados grabados, por fuente y en el orden del listado"""
+    from bench_parsers import CASOS
+
+    listados = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for caso in CASOS:
+            if caso.origen:
+                listados.append(caso.ejecutar(caso.cargar()))
+    return listados
+
+def sembrar_historial(novedades):
+    """
+    Registra en el historial todas las alertas de los fixtures salvo `novedades` de ellas.
+    Las nuevas son las primeras de cada listado, repartidas por turnos entre fuentes, igual que
+    cuando un sitio publica alertas nuevas arriba de las ya conocidas.
+
+    Returns:
+        int: Cantidad de alertas que quedaron como novedades
+    """
+    from history_store import HistorialAlertas
+
+    listados = alertas_de_fixtures()
+    urls_nuevas = set()
+    if novedades is None:
+        urls_nuevas = {alerta.url for listado in listados for alerta in listado}
+    else:
+        posicion = 0
+        while len(urls_nuevas) < novedades and any(posicion < len(listado) for listado in listados):
+            for listado in listados:
+                if posicion < len(listado) and len(urls_nuevas) < novedades:
+                    urls_nuevas.add(listado[posicion].url)
+            posicion += 1
+
+    conocidas = [alerta for listado in listados for alerta in listado if alerta.url not in urls_nuevas]
+    with HistorialAlertas() as historial:
+        historial.guardar(conocidas)
+    return len(urls_nuevas)
+
+def esperar_servidor(url_base, proceso):
+    limite = time.monotonic() + ESPERA_ARRANQUE_SEGUNDOS
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("El servidor de replay terminó al arrancar")
+        try:
+            with urllib.request.urlopen(f"{url_base}/_estado", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("El servidor de replay no respondió a tiempo")
+
+def ejecutar_escenario(nombre, puerto=PUERTO_DEFECTO, semilla=None, verboso=False):
+    """
+    Corre ejecutar_flujo una vez contra el replay. Debe llamarse en un proceso nuevo: la
+    configuración de los módulos se lee del entorno al importarlos.
+
+    Returns:
+        dict: Métricas del run
+    """
+    config = config_escenario(nombre)
+    url_base = f"http://127.0.0.1:{puerto}"
+    comando = [sys.executable, os.path.join(DIR_BENCHMARKS, 'replay_server.py'), '--escenario', nombre, '--puerto', str(puerto)]
+    if semilla is not None:
+        comando += ['--semilla', str(semilla)]
+
+    with tempfile.TemporaryDirectory() as dir_datos:
+        os.environ.update({
+            'URL_REPLAY': url_base,
+            'GEMINI_BASE_URL': f"{url_base}/gemini",
+            'URL_API_TELEGRAM': f"{url_base}/telegram",
+            'GEMINI_API_KEY': 'replay',
+            'TELEGRAM_TOKEN': 'replay',
+            'TELEGRAM_CHAT_ID': 'replay',
+            'DIR_DATOS': dir_datos,
+            **config['entorno']
+        })
+        sys.path.insert(0, RAIZ)
+
+        servidor = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+        try:
+            esperar_servidor(url_base, servidor)
+            novedades_esperadas = sembrar_historial(config['novedades'])
+
+            import content_extractor
+            import gemini_service
+            import main
+
+            cronometro = Cronometro()
+            cronometro.envolver(main, 'ejecutar_scrapers', 'scraping')
+            cronometro.envolver(main, 'procesar_novedades', 'procesamiento')
+            cronometro.envolver(content_extractor, 'extract_content', 'extraccion')
+            cronometro.envolver(gemini_service, 'generar_resumenes_lote', 'resumen_lote')
+            cronometro.envolver(gemini_service, 'generar_resumen', 'resumen')
+            cronometro.envolver(main.EMISOR_TELEGRAM, 'vaciar', 'envio_pendiente')
+
+            salida = contextlib.nullcontext() if verboso else contextlib.redirect_stdout(io.StringIO())
+            inicio = time.perf_counter()
+            with salida:
+                procesadas = main.ejecutar_flujo()
+            total = time.perf_counter() - inicio
+
+            with urllib.request.urlopen(f"{url_base}/_estadisticas", timeout=5) as response:
+                servidor_stats = json.load(response)
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+    return {
+        'escenario': nombre,
+        'total_s': round(total, 2),
+        'novedades_esperadas': novedades_esperadas,
+        'procesadas': len(procesadas),
+        'alertas_por_minuto': round(len(procesadas) / total * 60, 1) if total else 0.0,
+        'etapas': {etapa: {'segundos': round(segundos, 2), 'llamadas': llamadas}
+                   for etapa, (segundos, llamadas) in cronometro.etapas.items()},
+        'telegram_enviados': main.EMISOR_TELEGRAM.enviados,
+        'telegram_fallidos': main.EMISOR_TELEGRAM.fallidos,
+        'servidor': servidor_stats
+    }
+
+def imprimir(resultado):
+    print(f"\n=== Escenario {resultado['escenario']} ===")
+    print(f"Total: {resultado['total_s']:.1f}s | novedades {resultado['procesadas']}/{resultado['novedades_esperadas']} "
+          f"| {resultado['alertas_por_minuto']:.1f} alertas/min")
+    print("Etapas (tiempo acumulado; extracción y resúmenes suman sus hilos concurrentes):")
+    for etapa, medida in resultado['etapas'].items():
+        print(f"  {etapa:<16} {medida['segundos']:8.2f}s  {medida['llamadas']:4d} llamadas")
+    print(f"Telegram: {resultado['telegram_enviados']} mensajes enviados, {resultado['telegram_fallidos']} fallidos")
+    print("Servidor: " + ", ".join(f"{clave}={valor}" for clave, valor in sorted(resultado['servidor'].items())))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ejecutar_flujo contra el servidor de replay")
+    parser.add_argument('--escenario', choices=list(ESCENARIOS), default=None, help="Por defecto, todos")
+    parser.add_argument('--puerto', type=int, default=PUERTO_DEFECTO)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--verboso', action='store_true', help="Muestra la salida del flujo")
+    parser.add_argument('--json', default=None, help="Archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    if args.escenario:
+        resultados = [ejecutar_escenario(args.escenario, args.puerto, args.semilla, args.verboso)]
+    else:
+        # Un proceso por escenario: cada uno importa los módulos con su propio entorno
+        resultados = []
+        for nombre in ESCENARIOS:
+            with tempfile.NamedTemporaryFile(suffix='.json') as archivo:
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--escenario', nombre, '--puerto', str(args.puerto),
+                                '--semilla', str(args.semilla), '--json', archivo.name], check=True, stdout=subprocess.DEVNULL)
+                resultados.extend(json.load(open(archivo.name, encoding='utf-8')))
+
+    for resultado in resultados:
+        imprimir(resultado)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Benchmark offline de los parsers: items/s y memoria pico por fuente y por parser HTML.
+
+Cada caso parsea un fixture grabado en benchmarks/fixtures/ con la misma función parsear_* que
+usan los scrapers, sin red. Los casos de BeautifulSoup se miden con lxml y con html.parser.
+
+La comparación con baseline.json no usa llamadas/s absolutas (dependen de la máquina y de su carga):
+cada ronda del caso se alterna con una ronda de una carga de calibración fija y el caso se expresa
+relativo a ella (mediana de los cocientes por ronda).
+
+Uso:
+    python benchmarks/bench_parsers.py                   # reporte y comparación con baseline.json
+    python benchmarks/bench_parsers.py --umbral 0.2      # falla (exit 1) si algún caso cae más de 20%
+    python benchmarks/bench_parsers.py --actualizar-base # guarda como nueva base la mediana de varias corridas
+    python benchmarks/bench_parsers.py --grabar          # vuelve a descargar los fixtures de listados
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from html.parser import HTMLParser
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import content_extractor
+import scraper
+
+DIR_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ARCHIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Año fijo para los filtros de Bolivia y Costa Rica: los fixtures no envejecen
+ANIO_FIXTURES = 2026
+
+# Caída del throughput relativo (ver medir) respecto de la base a partir de la cual el benchmark
+# falla. En 4 corridas completas seguidas sobre la misma máquina, una medición quedó hasta 26% por
+# debajo de la mediana de las otras tres (llamadas/s absolutas: de -22% a +59%), y la mejor de dos
+# mediciones hasta 14%. Por eso la base es la mediana de VECES_BASE corridas, un caso marcado se
+# vuelve a medir antes de fallar, y el umbral deja unos puntos de margen sobre ese 14%
+UMBRAL_REGRESION = 0.20
+
+# Corridas completas cuya mediana se guarda con --actualizar-base
+VECES_BASE = 3
+
+# Cada medición repite el caso hasta cubrir este tiempo; se toma la mediana de RONDAS
+TIEMPO_MINIMO_RONDA = 0.15
+RONDAS = 5
+
+# Carga de calibración: el HTMLParser de la biblioteca estándar (Python puro, sin dependencias que
+# cambien de versión) sobre un documento sintético parecido a los listados
+DOCUMENTO_CALIBRACION = ''.join(
+    f'<tr class="docman_item"><td>Alerta N° {i}</td><td>Retiro del producto {i}</td>'
+    f'<td><time datetime="2026-01-01 10:00:00">01/01/2026</time></td><td><a href="/doc/{i}.pdf">Ver</a></td></tr>'
+    for i in range(200)
+)
+
+PARSERS_HTML = ['lxml', 'html.parser']
+
+class Caso:
+    """Un fixture, la función que lo parsea y la URL de donde se grabó (None si no se regraba)"""
+
+    def __init__(self, nombre, fixture, funcion, args=(), origen=None, modulo=scraper):
+        self.nombre = nombre
+        self.fixture = fixture
+        self.funcion = funcion
+        self.args = args
+        self.origen = origen
+        # Módulo cuyo PARSER_HTML usa la función (None: no usa BeautifulSoup)
+        self.modulo = modulo
+
+    def cargar(self):
+        with open(os.path.join(DIR_FIXTURES, self.fixture), 'rb') as f:
+            return f.read()
+
+    def ejecutar(self, contenido):
+        return self.funcion(contenido, *self.args)
+
+URL_COFEPRIS = "https://www.gob.mx/cofepris/documentos/alertas-sanitarias-de-{}"
+URL_ANMAT = "https://www.argentina.gob.ar/anmat/alertas/{}/noticias"
+URL_AGEMED = "https://apiwww.agemed.gob.bo/api/web/{}%7Ccontenido"
+URL_MINSALUD = "https://www.ministeriodesalud.go.cr/index.php/biblioteca-de-archivos-left/documentos-ministerio-de-salud/alertas-sanitarias/"
+
+CASOS = [
+    Caso('digemid_feed', 'digemid_feed.xml', scraper.parsear_feed, ('Perú', 'DIGEMID'),
+         origen="https://www.digemid.minsa.gob.pe/webDigemid/publicaciones/alertas-modificaciones/feed/?paged=1", modulo=None),
+    Caso('digemid_detalle', 'digemid_detalle.html', scraper.parsear_detalle_peru,
+         ("https://www.digemid.minsa.gob.pe/webDigemid/alertas/alerta-digemid-001/",)),
+    *[Caso(f'ispch_{categoria}', f'ispch_{categoria}.xml', scraper.parsear_feed, ('Chile', 'ISPCH'),
+           origen=f"https://www.ispch.gob.cl/categorias-alertas/{categoria}/feed/", modulo=None)
+      for categoria in ['anamed', 'dispositivos-medicos', 'desinfectantes-y-sanitizantes']],
+    Caso('anvisa', 'anvisa.html', scraper.parsear_brasil, origen="https://antigo.anvisa.gov.br/alertas"),
+    Caso('invima', 'invima.html', scraper.parsear_colombia,
+         origen="https://app.invima.gov.co/alertas/alertas-sanitarias-general?field_tipo_de_documento_value=2&field_a_o_value=1"),
+    *[Caso(f'cofepris_{categoria}', f'cofepris_{categoria}.html', scraper.parsear_mexico, (categoria,),
+           origen=URL_COFEPRIS.format(categoria))
+      for categoria in ['dispositivos-medicos', 'medicamentos', 'alimentos', 'bebidas-alcoholicas', 'suplementos-alimenticios']],
+    *[Caso(f'anmat_{categoria}', f'anmat_{categoria}.html', scraper.parsear_argentina, origen=URL_ANMAT.format(categoria))
+      for categoria in ['medicamentos', 'alimentos', 'productosmedicos', 'cosmeticos', 'domisanitarios']],
+    *[Caso(f'agemed_{categoria}', f'agemed_{categoria}.html', scraper.parsear_bolivia, (ANIO_FIXTURES,),
+           origen=URL_AGEMED.format(categoria))
+      for categoria in ['vigilanciacontrol', 'dtu']],
+    Caso('minsalud_radiologicas', 'minsalud_radiologicas.html', scraper.parsear_costarica, ('Radiológicas', ANIO_FIXTURES),
+         origen=URL_MINSALUD + "alertas-radiologicas"),
+    Caso('minsalud_productos', 'minsalud_productos.html', scraper.parsear_costarica, ('Productos', ANIO_FIXTURES),
+         origen=URL_MINSALUD + f"alertas-por-productos-en-el-mercado/{ANIO_FIXTURES}-advertencias-por-productos-en-el-mercado"),
+    Caso('minsalud_farmacovigilancia', 'minsalud_farmacovigilancia.html', scraper.parsear_costarica, ('Farmacovigilancia', ANIO_FIXTURES),
+         origen=URL_MINSALUD + f"alertas-farmacovigilancia/advertencias-farmacovigilancia-{ANIO_FIXTURES}"),
+    # Extracción de contenido para Gemini (páginas de detalle y PDFs)
+    Caso('extraccion_anmat', 'anmat_detalle.html', content_extractor.parsear_html, ('Argentina',), modulo=content_extractor),
+    Caso('extraccion_anvisa', 'anvisa_detalle.html', content_extractor.parsear_html, ('Brasil',), modulo=content_extractor),
+    *[Caso(f'pdf_{nombre}', f'alerta_{nombre}.pdf', content_extractor.parsear_pdf, modulo=None)
+      for nombre in ['una_pagina', 'varias_paginas', 'escaneada']],
+]
+
+def contar_items(resultado):
+    """Items producidos por una llamada: alertas de un listado, o 1 documento si hubo texto"""
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, tuple):
+        return 1 if any(resultado) else 0
+    return 1 if resultado else 0
+
+@contextlib.contextmanager
+def usando_parser(modulo, parser):
+    """Cambia temporalmente el PARSER_HTML del módulo que parsea el caso"""
+    if modulo is None:
+        yield
+        return
+    anterior = modulo.PARSER_HTML
+    modulo.PARSER_HTML = parser
+    try:
+        yield
+    finally:
+        modulo.PARSER_HTML = anterior
+
+def cronometrar(funcion):
+    """Segundos por llamada en una ronda de al menos TIEMPO_MINIMO_RONDA"""
+    repeticiones = 0
+    inicio = time.perf_counter()
+    while True:
+        funcion()
+        repeticiones += 1
+        transcurrido = time.perf_counter() - inicio
+        if transcurrido >= TIEMPO_MINIMO_RONDA:
+            return transcurrido / repeticiones
+
+def parsear_calibracion():
+    parser = HTMLParser()
+    parser.feed(DOCUMENTO_CALIBRACION)
+    parser.close()
+
+def medir(caso, contenido):
+    """
+    Throughput (mediana de RONDAS) y memoria pico de Python en una llamada aislada.
+
+    Cada ronda del caso va seguida de una de calibración: el cociente de la ronda compara las dos
+    cargas con la máquina en el mismo estado, y su mediana es el throughput relativo.
+
+    Returns:
+        tuple: (items por llamada, items/s, llamadas/s, relativo, KiB pico)
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = contar_items(caso.ejecutar(contenido))  # Calentamiento
+        parsear_calibracion()
+
+        tiempos, cocientes = [], []
+        for _ in range(RONDAS):
+            tiempo = cronometrar(lambda: caso.ejecutar(contenido))
+            tiempos.append(tiempo)
+            cocientes.append(cronometrar(parsear_calibracion) / tiempo)
+        tiempo = statistics.median(tiempos)
+
+        # Memoria en una pasada aparte: tracemalloc ralentiza la ejecución medida
+        tracemalloc.start()
+        caso.ejecutar(contenido)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return items, items / tiempo, 1 / tiempo, statistics.median(cocientes), pico / 1024
+
+def ejecutar_casos(casos, parsers, claves=None):
+    """
+    Args:
+        claves: Si se indica, solo se miden esos "caso/parser"
+
+    Returns:
+        dict: "caso/parser" -> {items, items_s, llamadas_s, relativo, pico_kib}; relativo son
+            las llamadas del caso en el tiempo de una llamada de calibración
+    """
+    resultados = {}
+    for caso in casos:
+        contenido = caso.cargar()
+        for parser in (parsers if caso.modulo else [None]):
+            clave = f"{caso.nombre}/{parser or '-'}"
+            if claves is not None and clave not in claves:
+                continue
+            with usando_parser(caso.modulo, parser):
+                items, items_s, llamadas_s, relativo, pico_kib = medir(caso, contenido)
+            resultados[clave] = {
+                'items': items,
+                'items_s': round(items_s, 1),
+                'llamadas_s': round(llamadas_s, 1),
+                'relativo': round(relativo, 4),
+                'pico_kib': round(pico_kib, 1)
+            }
+    return resultados
+
+def mediana_de_corridas(corridas):
+    """Mediana campo por campo de varias corridas de ejecutar_casos"""
+    return {
+        clave: {campo: round(statistics.median(corrida[clave][campo] for corrida in corridas), 4 if campo == 'relativo' else 1)
+                for campo in valores}
+        for clave, valores in corridas[0].items()
+    }
+
+def comparar(resultados, base, umbral):
+    """
+    Casos cuyo throughput relativo cayó más que el umbral respecto de la base
+
+    Se compara el relativo y no items/s (también cae si un fixture regrabado trae menos alertas)
+    ni llamadas/s (cambia con la máquina). Las entradas de la base sin relativo no se comparan.
+    """
+    regresiones = []
+    for clave, actual in resultados.items():
+        anterior = base.get(clave)
+        if not anterior or not anterior.get('relativo'):
+            continue
+        variacion = actual['relativo'] / anterior['relativo'] - 1
+        if variacion < -umbral:
+            regresiones.append((clave, variacion))
+    return regresiones
+
+def grabar_fixtures(casos):
+    """Vuelve a descargar los fixtures de los casos con URL de origen (requiere red)"""
+    import http_client
+
+    for caso in casos:
+        if not caso.origen:
+            continue
+        try:
+            response = http_client.get(caso.origen, 'feed' if caso.fixture.endswith('.xml') else 'listado')
+            if response.status_code != 200:
+                print(f"[!] {caso.nombre}: status {response.status_code}, se conserva el fixture anterior")
+                continue
+            with open(os.path.join(DIR_FIXTURES, caso.fixture), 'wb') as f:
+                f.write(response.content)
+            print(f"  ✓ {caso.fixture} ({len(response.content) / 1024:.0f} KiB)")
+        except Exception as e:
+            print(f"[!] {caso.nombre}: {e}")
+
+def cargar_base():
+    if not os.path.exists(ARCHIVO_BASE):
+        return {}
+    with open(ARCHIVO_BASE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de los parsers por fuente")
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION, help="Caída máxima aceptada (0.25 = 25%%)")
+    parser.add_argument('--solo', default=None, help="Ejecuta solo los casos cuyo nombre contiene este texto")
+    parser.add_argument('--parser', choices=PARSERS_HTML, default=None, help="Mide un solo parser HTML")
+    parser.add_argument('--actualizar-base', action='store_true', help="Guarda los resultados en baseline.json")
+    parser.add_argument('--grabar', action='store_true', help="Regraba los fixtures de listados desde los sitios")
+    args = parser.parse_args()
+
+    casos = [caso for caso in CASOS if not args.solo or args.solo in caso.nombre]
+    if args.grabar:
+        grabar_fixtures(casos)
+
+    parsers = [args.parser] if args.parser else PARSERS_HTML
+    resultados = ejecutar_casos(casos, parsers)
+    if args.actualizar_base:
+        # Una sola corrida puede tener casos fuera de lo normal: la base es la mediana de varias
+        resultados = mediana_de_corridas([resultados] + [ejecutar_casos(casos, parsers) for _ in range(VECES_BASE - 1)])
+    base = cargar_base()
+
+    print(f"{'caso/parser':<44} {'items':>5} {'items/s':>10} {'llamadas/s':>11} {'relativo':>9} {'pico KiB':>9} {'vs base':>8}")
+    for clave, r in resultados.items():
+        anterior = base.get(clave, {}).get('relativo')
+        variacion = f"{r['relativo'] / anterior - 1:+.0%}" if anterior else '-'
+        print(f"{clave:<44} {r['items']:>5} {r['items_s']:>10.0f} {r['llamadas_s']:>11.1f} {r['relativo']:>9.3f} "
+              f"{r['pico_kib']:>9.0f} {variacion:>8}")
+
+    if args.actualizar_base:
+        with open(ARCHIVO_BASE, 'w', encoding='utf-8') as f:
+            json.dump({**base, **resultados}, f, indent=2, ensure_ascii=False)
+        print(f"  ✓ Base actualizada: {ARCHIVO_BASE}")
+        return 0
+
+    regresiones = comparar(resultados, base, args.umbral)
+    if regresiones:
+        # Se confirma con una segunda medición: una ronda ruidosa no alcanza para fallar
+        print(f"  Volviendo a medir {len(regresiones)} casos por debajo del umbral...")
+        segunda = ejecutar_casos(casos, parsers, claves={clave for clave, _ in regresiones})
+        mejores = {clave: max(resultados[clave], segunda[clave], key=lambda r: r['relativo']) for clave in segunda}
+        regresiones = comparar(mejores, base, args.umbral)
+    for clave, variacion in regresiones:
+        print(f"[!] Regresión en {clave}: {variacion:+.0%} (umbral -{args.umbral:.0%})")
+    if regresiones:
+        return 1
+    if base:
+        print(f"  ✓ Sin regresiones mayores a {args.umbral:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
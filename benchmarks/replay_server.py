@@ -0,0 +1,272 @@
+"""
+Servidor local que reemplaza a las fuentes, a Gemini y a Telegram para medir el flujo completo.
+
+Las fuentes responden con los fixtures grabados de benchmarks/fixtures/ (los mismos del benchmark
+de parsers); Gemini y Telegram se emulan con respuestas del formato de sus APIs. La latencia, la
+tasa de errores, los 429 y las fuentes colgadas se configuran por escenario.
+
+El flujo se redirige al servidor con variables de entorno:
+    URL_REPLAY=http://127.0.0.1:8800            # fuentes: /<host>/<ruta>?<query>
+    GEMINI_BASE_URL=http://127.0.0.1:8800/gemini
+    URL_API_TELEGRAM=http://127.0.0.1:8800/telegram
+
+Uso:
+    python benchmarks/replay_server.py --escenario rafaga_50 --puerto 8800
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_FIXTURES = os.path.join(DIR_BENCHMARKS, 'fixtures')
+sys.path.insert(0, DIR_BENCHMARKS)
+
+PUERTO_DEFECTO = 8800
+
+# Latencias en segundos: (mínima, máxima) de una distribución uniforme
+CONFIG_BASE = {
+    'latencia_fuente': (0.05, 0.3),
+    'latencia_gemini': (0.6, 1.5),
+    'latencia_telegram': (0.05, 0.15),
+    'error_fuente': 0.0,      # Fracción de requests a fuentes que responden 503
+    'error_gemini': 0.0,      # Fracción de llamadas a Gemini que responden 503
+    'tasa_429_gemini': 0.0,   # Fracción de llamadas a Gemini que responden 429 con retryDelay
+    'tasa_429_telegram': 0.0, # Fracción de envíos que responden 429 con retry_after
+    'hosts_colgados': [],     # Hosts que no responden antes del timeout del cliente
+    'espera_colgado': 35.0,
+    'novedades': None,        # Cantidad de alertas nuevas (el resto se precarga en el historial)
+    'entorno': {}             # Variables de entorno del flujo en este escenario
+}
+
+ESCENARIOS = {
+    'normal': {
+        'novedades': 10
+    },
+    'rafaga_50': {
+        'novedades': 50
+    },
+    'fuentes_caidas': {
+        'novedades': 50,
+        'hosts_colgados': ['app.invima.gov.co', 'www.gob.mx']
+    },
+    'gemini_saturado': {
+        'novedades': 50,
+        'tasa_429_gemini': 0.3,
+        'error_gemini': 0.05
+    },
+    'red_inestable': {
+        'novedades': 50,
+        'latencia_fuente': (0.2, 2.0),
+        'error_fuente': 0.1,
+        'tasa_429_telegram': 0.1
+    }
+}
+
+def config_escenario(nombre):
+    if nombre not in ESCENARIOS:
+        raise ValueError(f"Escenario desconocido: {nombre} (disponibles: {', '.join(ESCENARIOS)})")
+    return {**CONFIG_BASE, **ESCENARIOS[nombre]}
+
+# Los años de las rutas (Costa Rica arma la URL con el año actual) no distinguen fixtures
+PATRON_ANIO = re.compile(r'\b20\d{2}\b')
+
+def _clave_ruta(host, ruta):
+    return host, PATRON_ANIO.sub('{anio}', ruta)
+
+@functools.cache
+def listados():
+    """Listados y feeds: la URL de origen de cada caso del benchmark de parsers"""
+    # Import diferido: bench_flujo importa este módulo antes de configurar el entorno del flujo
+    from bench_parsers import CASOS
+
+    return {_clave_ruta(urlparse(caso.origen).netloc, urlparse(caso.origen).path): caso.fixture
+            for caso in CASOS if caso.origen}
+
+# Detalles y documentos enlazados desde los listados: (host o None, patrón de ruta, fixture)
+DETALLES = [
+    ('www.digemid.minsa.gob.pe', re.compile(r'^/webDigemid/alertas/'), 'digemid_detalle.html'),
+    ('antigo.anvisa.gov.br', re.compile(r'^/alertas/-/'), 'anvisa_detalle.html'),
+    ('www.argentina.gob.ar', re.compile(r'^/noticias/'), 'anmat_detalle.html'),
+    # Chile: la página de la alerta redirige al PDF
+    ('www.ispch.gob.cl', re.compile(r'^/alerta/'), None),
+    (None, re.compile(r'(\.pdf|/file)$', re.IGNORECASE), None),
+]
+PDFS = ['alerta_una_pagina.pdf', 'alerta_varias_paginas.pdf', 'alerta_escaneada.pdf']
+
+def fixture_para(host, ruta):
+    """Nombre del fixture que responde a host + ruta, o None (404)"""
+    fixture = listados().get(_clave_ruta(host, ruta))
+    if fixture:
+        return fixture
+    for host_detalle, patron, fixture in DETALLES:
+        if (host_detalle is None or host_detalle == host) and patron.search(ruta):
+            # Los PDFs se reparten de forma estable entre las muestras
+            return fixture or PDFS[zlib.crc32(ruta.encode('utf-8')) % len(PDFS)]
+    return None
+
+class Estadisticas:
+    """Contadores del servidor, consultables en /_estadisticas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contadores = {}
+
+    def sumar(self, clave, cantidad=1):
+        with self._lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + cantidad
+
+    def a_dict(self):
+        with self._lock:
+            return dict(self.contadores)
+
+class ManejadorReplay(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = CONFIG_BASE
+    estadisticas = Estadisticas()
+    cache_fixtures = {}
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, cuerpo, tipo='application/json', cabeceras=None):
+        if isinstance(cuerpo, (dict, list)):
+            cuerpo = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _esperar(self, clave):
+        time.sleep(random.uniform(*self.config[clave]))
+
+    def _sorteo(self, clave):
+        return random.random() < self.config[clave]
+
+    def do_GET(self):
+        partes = urlparse(self.path)
+        if partes.path == '/_estadisticas':
+            return self._responder(200, self.estadisticas.a_dict())
+        if partes.path == '/_estado':
+            return self._responder(200, {'ok': True})
+
+        _, host, ruta = partes.path.split('/', 2)
+        ruta = '/' + ruta
+        self.estadisticas.sumar('fuente_requests')
+
+        if host in self.config['hosts_colgados']:
+            self.estadisticas.sumar('fuente_colgadas')
+            time.sleep(self.config['espera_colgado'])
+            return self._responder(504, b'', 'text/plain')
+
+        self._esperar('latencia_fuente')
+        if self._sorteo('error_fuente'):
+            self.estadisticas.sumar('fuente_errores')
+            return self._responder(503, b'Service Unavailable', 'text/plain')
+
+        fixture = fixture_para(host, ruta)
+        if fixture is None:
+            self.estadisticas.sumar('fuente_404')
+            return self._responder(404, b'Not Found', 'text/plain')
+
+        if fixture not in self.cache_fixtures:
+            with open(os.path.join(DIR_FIXTURES, fixture), 'rb') as f:
+                self.cache_fixtures[fixture] = f.read()
+        tipo = {'.xml': 'application/rss+xml', '.pdf': 'application/pdf'}.get(os.path.splitext(fixture)[1], 'text/html; charset=utf-8')
+        self._responder(200, self.cache_fixtures[fixture], tipo)
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path.startswith('/gemini/'):
+            return self._gemini(cuerpo)
+        if self.path.startswith('/telegram/'):
+            return self._telegram()
+        self._responder(404, {'error': 'ruta desconocida'})
+
+    def _gemini(self, cuerpo):
+        self.estadisticas.sumar('gemini_llamadas')
+        self._esperar('latencia_gemini')
+
+        if self._sorteo('tasa_429_gemini'):
+            self.estadisticas.sumar('gemini_429')
+            return self._responder(429, {'error': {
+                'code': 429, 'status': 'RESOURCE_EXHAUSTED', 'message': 'Quota exceeded (replay)',
+                'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '1s'}]
+            }})
+        if self._sorteo('error_gemini'):
+            self.estadisticas.sumar('gemini_errores')
+            return self._responder(503, {'error': {'code': 503, 'status': 'UNAVAILABLE', 'message': 'Overloaded (replay)'}})
+
+        peticion = json.loads(cuerpo or b'{}')
+        prompt = ' '.join(parte.get('text', '') for contenido in peticion.get('contents', []) for parte in contenido.get('parts', []))
+        en_lote = peticion.get('generationConfig', {}).get('responseMimeType') == 'application/json'
+
+        if en_lote:
+            ids = [int(i) for i in re.findall(r'\[id=(\d+)\]', prompt)]
+            texto = json.dumps([{'id': i, 'resumen': f"Resumen emulado del texto {i}: retiro de lotes por desviación de calidad."} for i in ids])
+            self.estadisticas.sumar('gemini_resumenes', len(ids))
+        else:
+            texto = "Resumen emulado: retiro de lotes por desviación de calidad."
+            self.estadisticas.sumar('gemini_resumenes')
+
+        self._responder(200, {
+            'candidates': [{'content': {'role': 'model', 'parts': [{'text': texto}]}, 'finishReason': 'STOP'}],
+            'usageMetadata': {'promptTokenCount': len(prompt) // 4, 'candidatesTokenCount': len(texto) // 4,
+                              'totalTokenCount': (len(prompt) + len(texto)) // 4},
+            'modelVersion': 'replay'
+        })
+
+    def _telegram(self):
+        self._esperar('latencia_telegram')
+        if self._sorteo('tasa_429_telegram'):
+            self.estadisticas.sumar('telegram_429')
+            return self._responder(429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                                         'parameters': {'retry_after': 1}})
+        self.estadisticas.sumar('telegram_mensajes')
+        self._responder(200, {'ok': True, 'result': {'message_id': self.estadisticas.a_dict()['telegram_mensajes']}})
+
+class ServidorReplay(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Los clientes que cortan por timeout (fuentes colgadas) no son errores del servidor
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+def crear_servidor(escenario, puerto=PUERTO_DEFECTO, semilla=None):
+    """Servidor listo para serve_forever() con la configuración del escenario"""
+    random.seed(semilla)
+    manejador = type('Manejador', (ManejadorReplay,), {'config': config_escenario(escenario), 'estadisticas': Estadisticas()})
+    return ServidorReplay(('127.0.0.1', puerto), manejador)
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de replay de fuentes, Gemini y Telegram")
+    parser.add_argument('--escenario', default='normal', choices=list(ESCENARIOS))
+    parser.add_argument('--puerto', type=int, default=PUERTO_DEFECTO)
+    parser.add_argument('--semilla', type=int, default=None, help="Semilla de latencias y errores (reproducibles)")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.escenario, args.puerto, args.semilla)
+    print(f"Replay escuchando en http://127.0.0.1:{args.puerto} (escenario {args.escenario})", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
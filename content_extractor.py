@@ -1,14 +1,25 @@
 import json
 import os
-from bs4 import BeautifulSoup
-import fitz  # PyMuPDF
-import requests
-from curl_cffi import requests as curl_requests
-import tempfile
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+import soupsieve
+import http_client
+import metrics
+import parse_pool
 
 # Cargar configuración
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'extraction_config.json')
 
+# Límites de extracción de PDFs
+MAX_BYTES_PDF = int(os.environ.get('MAX_BYTES_PDF', 8 * 1024 * 1024))  # Tope duro de descarga
+MAX_PAGINAS_PDF = 3
+TAMANO_BLOQUE_DESCARGA = 64 * 1024
+
+# Presupuesto de caracteres del texto enviado a Gemini
+MAX_CARACTERES_EXTRAIDOS = int(os.environ.get('MAX_CARACTERES_EXTRAIDOS', 1500))
+
+# Parser de las páginas de detalle (el mismo que usan los listados en scraper.py)
+PARSER_HTML = 'lxml'
+
 def load_config():
     """Carga la configuración de extracción por país"""
     try:
@@ -20,109 +31,232 @@ def load_config():
 
 CONFIG = load_config()
 
-def extract_text_from_html(url, pais):
+# Selectores por defecto para países sin configuración HTML
+SELECTORES_DEFECTO = ['article', 'main', 'div.content']
+ELIMINAR_DEFECTO = ['script', 'style', 'nav', 'footer']
+
+# Tipos de string que cuentan como texto visible (igual que get_text: sin comentarios ni scripts)
+TIPOS_TEXTO = (NavigableString, CData)
+
+class PlanExtraccion:
+    """
+    Configuración de un país compilada una sola vez: los selectores se unen en un único
+    selector compilado (soupsieve) por rol, y la extracción recorre el documento una vez:
+    - salta los subárboles que coinciden con remove_selectors,
+    - toma el texto de cada elemento que coincide con selectors sin bajar a sus hijos
+      (una coincidencia anidada dentro de otra no duplica texto),
+    - deja de recorrer al alcanzar el presupuesto de caracteres.
+    """
+
+    def __init__(self, config):
+        contenedor = config.get('container')
+        selectores = config.get('selectors', SELECTORES_DEFECTO)
+        eliminar = config.get('remove_selectors', ELIMINAR_DEFECTO)
+
+        self.contenedor = soupsieve.compile(contenedor) if contenedor else None
+        self.objetivo = soupsieve.compile(', '.join(selectores))
+        self.eliminar = soupsieve.compile(', '.join(eliminar)) if eliminar else None
+
+    def _eliminado(self, tag):
+        return self.eliminar is not None and self.eliminar.match(tag)
+
+    def _texto(self, elemento):
+        """Texto de un elemento omitiendo los descendientes eliminados"""
+        partes = []
+        pila = list(reversed(elemento.contents))
+        while pila:
+            nodo = pila.pop()
+            if isinstance(nodo, Tag):
+                if not self._eliminado(nodo):
+                    pila.extend(reversed(nodo.contents))
+            elif type(nodo) in TIPOS_TEXTO:
+                texto = nodo.strip()
+                if texto:
+                    partes.append(texto)
+        return ' '.join(partes)
+
+    def extraer(self, soup, max_caracteres):
+        """
+        Returns:
+            str: Texto de los elementos objetivo en orden de documento, o None si no hay contenedor
+        """
+        scope = self.contenedor.select_one(soup) if self.contenedor else soup
+        if scope is None:
+            return None
+
+        fragmentos = []
+        total = 0
+        pila = list(reversed(scope.contents))
+        while pila and total < max_caracteres:
+            nodo = pila.pop()
+            if not isinstance(nodo, Tag) or self._eliminado(nodo):
+                continue
+            if self.objetivo.match(nodo):
+                texto = self._texto(nodo)
+                if texto:
+                    fragmentos.append(texto)
+                    total += len(texto) + 1
+                continue
+            pila.extend(reversed(nodo.contents))
+
+        return ' '.join(fragmentos)
+
+def compilar_planes(config):
+    """Compila un PlanExtraccion por cada país con content_type html"""
+    planes = {}
+    for pais, config_pais in config.items():
+        if config_pais.get('content_type') != 'html':
+            continue
+        try:
+            planes[pais] = PlanExtraccion(config_pais)
+        except Exception as e:
+            print(f"[!] Selectores inválidos en la configuración de {pais}: {e}")
+    return planes
+
+PLANES = compilar_planes(CONFIG)
+PLAN_DEFECTO = PlanExtraccion({})
+
+def parsear_html(contenido, pais, max_caracteres=MAX_CARACTERES_EXTRAIDOS):
+    """
+    Extrae el texto de un HTML ya descargado con el plan compilado del país.
+    Función pura sobre el contenido: puede correr en el pool de procesos (parse_pool).
+
+    Args:
+        contenido: Bytes del HTML
+        pais: Nombre del país para obtener configuración
+        max_caracteres: Presupuesto de caracteres, se deja de recorrer al alcanzarlo
+
+    Returns:
+        str: Texto extraído, o None si no se encontró contenido
+    """
+    plan = PLANES.get(pais, PLAN_DEFECTO)
+    soup = BeautifulSoup(contenido, PARSER_HTML)
+
+    texto_final = plan.extraer(soup, max_caracteres)
+    if texto_final is None:
+        print(f"[!] No se encontró el contenedor para {pais}")
+        return None
+
+    # Limpiar espacios múltiples
+    texto_final = ' '.join(texto_final.split())[:max_caracteres]
+
+    return texto_final if texto_final else None
+
+def extract_text_from_html(url, pais, max_caracteres=MAX_CARACTERES_EXTRAIDOS):
     """
     Extrae texto de una página HTML usando selectores configurados por país
     
     Args:
         url: URL de la página HTML
         pais: Nombre del país para obtener configuración
+        max_caracteres: Presupuesto de caracteres del texto extraído
         
     Returns:
-        str: Primeras 1500 caracteres de texto extraído
+        str: Primeros max_caracteres de texto extraído
     """
     try:
-        # Obtener configuración del país
-        config = CONFIG.get(pais, {})
-        container_selector = config.get('container')
-        selectors = config.get('selectors', ['article', 'main', 'div.content'])
-        remove_selectors = config.get('remove_selectors', ['script', 'style', 'nav', 'footer'])
-        
         # Hacer request
-        response = curl_requests.get(
-            url,
-            impersonate="chrome110",
-            timeout=15,
-            verify=False
-        )
+        response = http_client.get(url, tipo='html')
         
         if response.status_code != 200:
             print(f"[!] Error HTTP {response.status_code} al extraer HTML de {url}")
             return None
-            
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remover elementos no deseados
-        for selector in remove_selectors:
-            for element in soup.select(selector):
-                element.decompose()
-        
-        # Area de Extracción
-        scope = soup.select_one(container_selector) if container_selector else soup
-        if not scope:
-            print(f"[!] No se encontró el contenedor para {pais}")
-            return None
 
-        # Extracción de texto
-        fragmentos = []
-        for selector in selectors:
-            elementos = scope.select(selector)
-            for elem in elementos:
-                texto_limpio = elem.get_text(separator = ' ', strip = True)
-                if texto_limpio:
-                    fragmentos.append(texto_limpio)
-        
-        texto_final = ' '.join(fragmentos)
-        
-        # Limpiar espacios múltiples
-        texto_final = ' '.join(texto_final.split())
-        
-        return texto_final if texto_final else None
+        with metrics.span('parseo', funcion='parsear_html') as span:
+            span.datos['bytes'] = len(response.content)
+            return parse_pool.ejecutar(parsear_html, response.content, pais, max_caracteres)
         
     except Exception as e:
         print(f"[!] Error extrayendo HTML de {url}: {e}")
         return None
 
-def extract_text_from_pdf(url):
+def descargar_pdf(url, max_bytes=MAX_BYTES_PDF):
     """
-    Extrae texto de un PDF usando PyMuPDF
-    
+    Descarga un PDF en streaming con un tope duro de bytes
+
     Args:
         url: URL del archivo PDF
-        
+        max_bytes: Tamaño máximo aceptado
+
     Returns:
-        str: Primeras 1500 caracteres de texto extraído
+        bytes: Contenido del PDF, o None si falla o supera el tope
     """
+    response = http_client.get(url, tipo='pdf', stream=True)
     try:
-        # Descargar PDF en la memoria RAM
-        response = curl_requests.get(
-            url,
-            impersonate="chrome110",
-            timeout=20,
-            verify=False
-        )
-        
         if response.status_code != 200:
             print(f"[!] Error HTTP {response.status_code} al descargar PDF de {url}")
             return None
+
+        # Si el servidor informa el tamaño, se descarta antes de bajar el cuerpo
+        largo_declarado = response.headers.get('Content-Length')
+        if largo_declarado and largo_declarado.isdigit() and int(largo_declarado) > max_bytes:
+            print(f"[!] PDF demasiado grande ({int(largo_declarado)} bytes), se omite: {url}")
+            return None
+
+        contenido = bytearray()
+        for bloque in response.iter_content(chunk_size=TAMANO_BLOQUE_DESCARGA):
+            contenido.extend(bloque)
+            if len(contenido) > max_bytes:
+                print(f"[!] PDF supera el tope de {max_bytes} bytes, se corta la descarga: {url}")
+                return None
+
+        return bytes(contenido)
+
+    finally:
+        response.close()
+
+def parsear_pdf(contenido, max_caracteres=MAX_CARACTERES_EXTRAIDOS):
+    """
+    Extrae el texto de las primeras páginas de un PDF ya descargado.
+    Función pura sobre el contenido: puede correr en el pool de procesos (parse_pool).
+
+    Args:
+        contenido: Bytes del PDF
+        max_caracteres: Presupuesto de caracteres, se deja de leer páginas al alcanzarlo
+
+    Returns:
+        str: Primeros max_caracteres de texto extraído, o None si no hay texto
+    """
+    import fitz  # PyMuPDF: se importa solo cuando hay un PDF que leer
+
+    with fitz.open(stream=contenido, filetype="pdf") as doc:
+        fragmentos = []
+        total = 0
+        num_paginas = min(MAX_PAGINAS_PDF, len(doc))
+
+        for page_num in range(num_paginas):
+            page = doc.load_page(page_num)
+            texto = ' '.join(page.get_text('text').split())
+            if texto:
+                fragmentos.append(texto)
+                total += len(texto) + 1
+            # Con el presupuesto cubierto no hace falta leer más páginas
+            if total >= max_caracteres:
+                break
+
+        texto_final = ' '.join(fragmentos)[:max_caracteres]
+
+        return texto_final if texto_final else None
+
+def extract_text_from_pdf(url, max_caracteres=MAX_CARACTERES_EXTRAIDOS):
+    """
+    Extrae texto de un PDF usando PyMuPDF
+    
+    Args:
+        url: URL del archivo PDF
+        max_caracteres: Presupuesto de caracteres, se deja de leer páginas al alcanzarlo
         
-        # Guardar temporalmente
-        with fitz.open(stream=response.content, filetype="pdf") as doc:
-            fragmentos = []
-            num_paginas = min(3, len(doc))
-
-            for page_num in range(num_paginas):
-                page = doc.load_page(page_num)
-                texto = page.get_text('text')
-                if texto:
-                    fragmentos.append(texto)
-            
-            texto_final = ' '.join(fragmentos)
-            
-            # Limpiar espacios múltiples
-            texto_final = ' '.join(texto_final.split())
-            
-            return texto_final if texto_final else None
+    Returns:
+        str: Primeros max_caracteres de texto extraído
+    """
+    try:
+        contenido = descargar_pdf(url)
+        if not contenido:
+            return None
+
+        with metrics.span('parseo', funcion='parsear_pdf') as span:
+            span.datos['bytes'] = len(contenido)
+            return parse_pool.ejecutar(parsear_pdf, contenido, max_caracteres)
                 
     except Exception as e:
         print(f"[!] Error extrayendo PDF de {url}: {e}")
@@ -133,29 +267,35 @@ def extract_content(noticia):
     Extrae contenido de una noticia según su país y tipo de contenido
     
     Args:
-        noticia: Dict con información de la noticia (debe incluir 'pais', 'url', opcionalmente 'pdf')
+        noticia: Alerta con la información de la noticia (usa pais, url y, para Perú, pdf)
         
     Returns:
         str: Texto extraído o None si falla
     """
-    pais = noticia.get('pais')
+    pais = noticia.pais
     config = CONFIG.get(pais, {})
     content_type = config.get('content_type', 'pdf')
     
     print(f"  → Extrayendo contenido ({content_type}) para {pais}...")
-    
-    if content_type == 'html':
-        # Países con HTML: Argentina, Brasil
-        url = noticia.get('url')
-        return extract_text_from_html(url, pais)
-    
-    elif content_type == 'pdf':
-        # Para Perú, usar el link PDF si existe
-        if pais == 'Perú' and noticia.get('pdf'):
-            url = noticia.get('pdf')
-        else:
-            url = noticia.get('url')
-        
-        return extract_text_from_pdf(url)
-    
-    return None
+
+    texto = None
+    with metrics.span('extraccion', pais=pais, tipo=content_type) as span:
+        if content_type == 'html':
+            # Países con HTML: Argentina, Brasil
+            url = noticia.url
+            texto = extract_text_from_html(url, pais)
+
+        elif content_type == 'pdf':
+            # Para Perú, usar el link PDF si existe
+            if pais == 'Perú' and noticia.pdf:
+                url = noticia.pdf
+            else:
+                url = noticia.url
+
+            texto = extract_text_from_pdf(url)
+
+        span.datos['caracteres'] = len(texto) if texto else 0
+
+    if not texto:
+        metrics.contar('extraccion_vacia', pais=pais)
+    return texto
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+import sqlite3
+from contextlib import closing
 
 # Configuración de la página
 st.set_page_config(page_title="Dashboard Alertas Sanitarias", layout="wide")
@@ -9,9 +11,11 @@ st.set_page_config(page_title="Dashboard Alertas Sanitarias", layout="wide")
 # 1. CARGA DE DATOS
 @st.cache_data(ttl=120)
 def load_data(filepath):
-    file_path = "noticias_historial.csv"
-    
-    df = pd.read_csv(filepath)
+    if not os.path.exists(filepath):
+        return None
+
+    with closing(sqlite3.connect(filepath)) as conn:
+        df = pd.read_sql_query("SELECT url, titulo, fecha, pais, institucion, categoria, pdf, resumen FROM alertas", conn)
 
     # Convierto la fecha a datetime
     df["fecha"] = df["fecha"].astype(str).str.split(" ").str[0]
@@ -23,7 +27,7 @@ def load_data(filepath):
     return df
 
 # Cargar datos
-FILE_NAME = "noticias_historial.csv"
+FILE_NAME = "noticias_historial.db"
 df = load_data(FILE_NAME)
 
 # 2. INTERFAZ Y FILTROS
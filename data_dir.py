@@ -0,0 +1,5 @@
+import os
+
+# Directorio de los archivos de estado (historial, caches, salud de hosts, métricas, bloqueo del run);
+# DIR_DATOS permite aislarlos (p. ej. en benchmarks/)
+DIR_DATOS = os.environ.get('DIR_DATOS', os.path.dirname(os.path.abspath(__file__)))
@@ -1,6 +1,15 @@
 import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+import metrics
+from pipeline import ReintentarResumen
+from summary_cache import CacheResumenes
 
 # System instruction para Gemini
 SYSTEM_INSTRUCTION = """
@@ -10,6 +19,163 @@ No agregues recomendaciones, acciones ni especulaciones. No inventes informació
 Si el texto está en otro idioma, traduce y redacta SIEMPRE el resumen en español.
 """
 
+# Instrucción adicional para resumir varios textos en una sola llamada
+INSTRUCCION_LOTE = """
+Recibirás varios textos, cada uno precedido por su identificador [id=N].
+Resume cada texto por separado y devuelve un resumen por cada id recibido.
+"""
+
+# Esquema de la respuesta estructurada por lotes
+ESQUEMA_LOTE = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            'id': types.Schema(type=types.Type.INTEGER),
+            'resumen': types.Schema(type=types.Type.STRING)
+        },
+        required=['id', 'resumen']
+    )
+)
+
+MODELO = 'gemini-2.5-flash'
+TOKENS_SALIDA_POR_RESUMEN = 100
+
+TIMEOUT_MS = 30000
+
+# Endpoint alternativo de la API (p. ej. el servidor de replay de benchmarks/); None = el oficial
+URL_BASE_GEMINI = os.environ.get('GEMINI_BASE_URL')
+# Errores transitorios (rate limit, sobrecarga, cortes de red): los reintenta el pipeline
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+# Versión del prompt: cambia sola si cambian el modelo, las instrucciones o el esquema del lote,
+# invalidando el cache (los resúmenes individuales y por lote comparten las entradas)
+VERSION_PROMPT = hashlib.sha256(
+    f"{MODELO}\n{SYSTEM_INSTRUCTION}\n{INSTRUCCION_LOTE}\n{ESQUEMA_LOTE.model_dump_json(exclude_none=True)}".encode('utf-8')
+).hexdigest()[:16]
+
+_cache = None
+
+def obtener_cache():
+    """Cache de resúmenes compartido por el proceso"""
+    global _cache
+    if _cache is None:
+        _cache = CacheResumenes(VERSION_PROMPT)
+        # Cerrar la conexión vuelca el WAL al archivo, que es el que se versiona
+        atexit.register(_cache.cerrar)
+    return _cache
+
+def resumen_en_cache(texto_contenido):
+    """Devuelve el resumen ya generado para este texto, sin llamar a la API, o None"""
+    try:
+        resumen = obtener_cache().obtener(texto_contenido)
+    except Exception as e:
+        print(f"[!] Error leyendo cache de resúmenes: {e}")
+        return None
+    metrics.contar('resumen_cache', resultado='acierto' if resumen else 'fallo')
+    return resumen
+
+def _guardar_en_cache(texto_contenido, resumen):
+    try:
+        obtener_cache().guardar(texto_contenido, resumen)
+    except Exception as e:
+        print(f"[!] Error guardando en cache de resúmenes: {e}")
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+# Contabilidad de llamadas a la API (acumulada por proceso)
+ESTADISTICAS = {
+    'llamadas': 0,
+    'transitorias': 0,
+    'fallidas': 0,
+    'latencia_total': 0.0,
+    'latencia_maxima': 0.0,
+    'tokens_entrada': 0,
+    'tokens_salida': 0
+}
+_lock_estadisticas = threading.Lock()
+
+def obtener_cliente():
+    """Cliente Gemini de larga vida, compartido por todas las llamadas (reusa conexiones HTTP)"""
+    global _cliente
+    api_key = os.environ.get('GEMINI_API_KEY')
+    if not api_key:
+        return None
+
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=URL_BASE_GEMINI, timeout=TIMEOUT_MS))
+    return _cliente
+
+def _es_transitorio(error):
+    if isinstance(error, errors.APIError):
+        return error.code in CODIGOS_TRANSITORIOS
+    return isinstance(error, httpx.TransportError)
+
+def _espera_sugerida(error):
+    """Segundos de espera que sugiere el servidor (RetryInfo.retryDelay o cabecera Retry-After), o None"""
+    try:
+        for detalle in error.details.get('error', {}).get('details', []):
+            if 'retryDelay' in detalle:
+                return float(str(detalle['retryDelay']).rstrip('s'))
+    except Exception:
+        pass
+    try:
+        return float(error.response.headers.get('Retry-After'))
+    except Exception:
+        return None
+
+def _registrar_llamada(latencia, response=None, transitoria=False, fallida=False):
+    uso = getattr(response, 'usage_metadata', None)
+    with _lock_estadisticas:
+        ESTADISTICAS['llamadas'] += 1
+        ESTADISTICAS['transitorias'] += int(transitoria)
+        ESTADISTICAS['fallidas'] += int(fallida)
+        ESTADISTICAS['latencia_total'] += latencia
+        ESTADISTICAS['latencia_maxima'] = max(ESTADISTICAS['latencia_maxima'], latencia)
+        if uso:
+            ESTADISTICAS['tokens_entrada'] += uso.prompt_token_count or 0
+            ESTADISTICAS['tokens_salida'] += uso.candidates_token_count or 0
+
+def _generar_contenido(cliente, prompt, config, textos=1):
+    """
+    Un intento de generate_content. Los errores transitorios se relanzan como ReintentarResumen
+    (con la espera que sugiere el servidor, si la hay): el pipeline reintenta pasando de nuevo por
+    el limitador de cuota y sin superar el límite de la etapa, cosa que este hilo no puede hacer.
+    """
+    inicio = time.monotonic()
+    try:
+        with metrics.span('gemini', modo='lote' if textos > 1 else 'individual') as span:
+            span.datos['textos'] = textos
+            response = cliente.models.generate_content(model=MODELO, contents=prompt, config=config)
+            uso = getattr(response, 'usage_metadata', None)
+            if uso:
+                span.datos['tokens_entrada'] = uso.prompt_token_count
+                span.datos['tokens_salida'] = uso.candidates_token_count
+        _registrar_llamada(time.monotonic() - inicio, response)
+        return response
+
+    except Exception as e:
+        transitorio = _es_transitorio(e)
+        _registrar_llamada(time.monotonic() - inicio, transitoria=transitorio, fallida=True)
+        metrics.contar('gemini_errores', codigo=getattr(e, 'code', None) or e.__class__.__name__)
+        if not transitorio:
+            raise
+        raise ReintentarResumen(f"Error transitorio de Gemini ({e.__class__.__name__})", _espera_sugerida(e)) from e
+
+def resumen_estadisticas():
+    """Resumen legible de las llamadas a Gemini del proceso"""
+    with _lock_estadisticas:
+        e = dict(ESTADISTICAS)
+    exitosas = e['llamadas'] - e['fallidas']
+    latencia_media = e['latencia_total'] / e['llamadas'] if e['llamadas'] else 0.0
+    return (
+        f"Gemini: {e['llamadas']} llamadas ({exitosas} exitosas, {e['transitorias']} con error transitorio), "
+        f"latencia media {latencia_media:.2f}s / máx {e['latencia_maxima']:.2f}s, "
+        f"tokens {e['tokens_entrada']} entrada / {e['tokens_salida']} salida"
+    )
+
 def generar_resumen(texto_contenido, titulo_original=""):
     """
     Genera un resumen de 20-30 palabras usando Gemini API
@@ -20,29 +186,36 @@ def generar_resumen(texto_contenido, titulo_original=""):
         
     Returns:
         str: Resumen generado o título original si falla
+
+    Raises:
+        ReintentarResumen: Ante un error transitorio de la API, para que el llamador reintente
     """
+    cacheado = resumen_en_cache(texto_contenido)
+    if cacheado:
+        print(f"  ✓ Resumen desde cache: {cacheado[:50]}...")
+        return cacheado
+
     try:
-        # Configurar cliente Gemini
-        api_key = os.environ.get('GEMINI_API_KEY')
+        # Cliente Gemini compartido
+        client = obtener_cliente()
         
-        if not api_key:
+        if client is None:
             print("[!] GEMINI_API_KEY no encontrada en variables de entorno")
+            metrics.contar('resumen_fallback', motivo='sin_api_key')
             return titulo_original
         
-        client = genai.Client(api_key=api_key)
-        
         # Preparar prompt
         prompt = f"Texto a resumir:\n\n{texto_contenido}"
         
         # Generar resumen
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
+        response = _generar_contenido(
+            client,
+            prompt,
+            types.GenerateContentConfig(
                 system_instruction=SYSTEM_INSTRUCTION,
                 thinking_config = types.ThinkingConfig(thinkingBudget = 2),
                 temperature=0.2,
-                max_output_tokens=100
+                max_output_tokens=TOKENS_SALIDA_POR_RESUMEN
             )
         )
         
@@ -50,11 +223,80 @@ def generar_resumen(texto_contenido, titulo_original=""):
         if response and response.text:
             resumen = response.text.strip()
             print(f"  ✓ Resumen generado: {resumen[:50]}...")
+            _guardar_en_cache(texto_contenido, resumen)
             return resumen
         else:
             print("[!] Gemini no devolvió respuesta válida")
+            metrics.contar('resumen_fallback', motivo='respuesta_vacia')
             return titulo_original
-            
+
+    except ReintentarResumen:
+        raise
     except Exception as e:
         print(f"[!] Error generando resumen con Gemini: {e}")
+        metrics.contar('resumen_fallback', motivo='error_api')
         return titulo_original
+
+def generar_resumenes_lote(textos):
+    """
+    Genera los resúmenes de varios textos en una sola llamada a Gemini con respuesta JSON
+
+    Args:
+        textos: Lista de textos extraídos
+
+    Returns:
+        list: Un resumen por texto, en el mismo orden; None para los que la respuesta no cubrió
+
+    Raises:
+        ReintentarResumen: Ante un error transitorio de la API, para que el llamador reintente
+    """
+    resumenes = [None] * len(textos)
+    if not textos:
+        return resumenes
+
+    try:
+        client = obtener_cliente()
+
+        if client is None:
+            print("[!] GEMINI_API_KEY no encontrada en variables de entorno")
+            return resumenes
+
+        # Cada texto va identificado por su posición para poder mapear la respuesta
+        bloques = [f"[id={i}]\n{texto}" for i, texto in enumerate(textos)]
+        prompt = "Textos a resumir:\n\n" + "\n\n".join(bloques)
+
+        response = _generar_contenido(
+            client,
+            prompt,
+            types.GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION + INSTRUCCION_LOTE,
+                thinking_config = types.ThinkingConfig(thinkingBudget = 2),
+                temperature=0.2,
+                max_output_tokens=TOKENS_SALIDA_POR_RESUMEN * len(textos),
+                response_mime_type='application/json',
+                response_schema=ESQUEMA_LOTE
+            ),
+            textos=len(textos)
+        )
+
+        if not response or not response.text:
+            print("[!] Gemini no devolvió respuesta válida para el lote")
+            return resumenes
+
+        for item in json.loads(response.text):
+            indice = item.get('id')
+            resumen = (item.get('resumen') or '').strip()
+            if isinstance(indice, int) and 0 <= indice < len(textos) and resumen:
+                resumenes[indice] = resumen
+                _guardar_en_cache(textos[indice], resumen)
+
+        cubiertos = sum(1 for r in resumenes if r)
+        metrics.contar('resumenes_lote', cubiertos)
+        print(f"  ✓ Lote resumido: {cubiertos}/{len(textos)} resúmenes")
+        return resumenes
+
+    except ReintentarResumen:
+        raise
+    except Exception as e:
+        print(f"[!] Error generando resúmenes por lote con Gemini: {e}")
+        return resumenes
@@ -0,0 +1,349 @@
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from alerts import Alerta
+from data_dir import DIR_DATOS
+
+ARCHIVO_BD = os.path.join(DIR_DATOS, 'noticias_historial.db')
+ARCHIVO_CSV_LEGADO = os.path.join(DIR_DATOS, 'noticias_historial.csv')
+
+COLUMNAS = ["url", "titulo", "fecha", "pais", "institucion", "categoria", "pdf", "resumen"]
+
+# Consultas de existencia por lotes (límite de variables de SQLite)
+TAMANO_LOTE_CONSULTA = 500
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS alertas (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    titulo TEXT,
+    fecha TEXT,
+    pais TEXT,
+    institucion TEXT,
+    categoria TEXT,
+    pdf TEXT,
+    resumen TEXT,
+    registrado TEXT DEFAULT CURRENT_TIMESTAMP,
+    resumen_intentos INTEGER NOT NULL DEFAULT 0,
+    resumen_intento TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_alertas_url ON alertas(url);
+CREATE INDEX IF NOT EXISTS idx_alertas_pais ON alertas(pais);
+CREATE INDEX IF NOT EXISTS idx_alertas_fecha ON alertas(fecha);
+
+CREATE TABLE IF NOT EXISTS pendientes (
+    url TEXT PRIMARY KEY,
+    titulo TEXT,
+    fecha TEXT,
+    pais TEXT,
+    institucion TEXT,
+    categoria TEXT,
+    pdf TEXT,
+    resumen TEXT,
+    contenido TEXT,
+    etapa TEXT NOT NULL DEFAULT 'extraccion',
+    motivo TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    registrado TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Alertas que necesitan resumen: sin resumen o con el título como fallback
+CONDICION_SIN_RESUMEN = "(resumen IS NULL OR resumen = '' OR resumen = titulo)"
+
+# Índice parcial: solo contiene las filas sin resumen, así buscarlas no recorre todo el historial
+ESQUEMA_INDICES_POSTERIORES = f"""
+CREATE INDEX IF NOT EXISTS idx_alertas_sin_resumen ON alertas(resumen_intentos, id DESC) WHERE {CONDICION_SIN_RESUMEN};
+"""
+
+# Etapas de una novedad en la cola, en orden: la etapa guardada es la próxima que le falta
+ETAPAS = ('extraccion', 'resumen', 'envio', 'historial')
+
+# Columnas agregadas a cada tabla después de su primera versión
+COLUMNAS_AGREGADAS = {
+    'alertas': {
+        'resumen_intentos': "INTEGER NOT NULL DEFAULT 0",
+        'resumen_intento': "TEXT"
+    },
+    'pendientes': {
+        'contenido': "TEXT",
+        'etapa': "TEXT NOT NULL DEFAULT 'extraccion'"
+    }
+}
+
+def _preparar_base(conn):
+    """Modo WAL, esquema y migraciones de columnas (idempotente)"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(ESQUEMA)
+    for tabla, columnas in COLUMNAS_AGREGADAS.items():
+        existentes = {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+        for columna, definicion in columnas.items():
+            if columna not in existentes:
+                conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+    # Los índices sobre columnas agregadas se crean recién con la migración hecha
+    conn.executescript(ESQUEMA_INDICES_POSTERIORES)
+
+class HistorialAlertas:
+    """
+    Historial de alertas en SQLite (modo WAL) con índice único por URL.
+
+    Reemplaza al CSV reescrito completo en cada run: las consultas de existencia usan el índice
+    y solo se insertan las filas nuevas, así el costo de un run no crece con el historial.
+    Implementa `in` para poder pasarse directamente a los scrapers como conjunto de URLs conocidas.
+    """
+
+    def __init__(self, ruta=ARCHIVO_BD):
+        self.ruta = ruta
+        self.conn = sqlite3.connect(ruta)
+        _preparar_base(self.conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cerrar()
+
+    def __contains__(self, url):
+        fila = self.conn.execute("SELECT 1 FROM alertas WHERE url = ? LIMIT 1", (url,)).fetchone()
+        return fila is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM alertas").fetchone()[0]
+
+    def urls_existentes(self, urls):
+        """
+        Devuelve cuáles de las URLs ya están en el historial
+
+        Args:
+            urls: Iterable de URLs candidatas
+
+        Returns:
+            set: Subconjunto de URLs ya registradas
+        """
+        urls = [u for u in set(urls) if u]
+        existentes = set()
+        for i in range(0, len(urls), TAMANO_LOTE_CONSULTA):
+            lote = urls[i:i + TAMANO_LOTE_CONSULTA]
+            marcadores = ",".join("?" * len(lote))
+            filas = self.conn.execute(f"SELECT url FROM alertas WHERE url IN ({marcadores})", lote)
+            existentes.update(fila[0] for fila in filas)
+        return existentes
+
+    def publicaciones_por_pais(self, dias):
+        """
+        Cantidad de alertas por país con fecha de publicación en los últimos `dias` días
+
+        Returns:
+            dict: pais -> cantidad (las fechas no parseables, como "Sin fecha", no cuentan)
+        """
+        # Las fechas se guardan como dd-mm-YYYY[ HH:MM[:SS]]
+        filas = self.conn.execute(
+            "SELECT pais, COUNT(*) FROM alertas "
+            "WHERE date(substr(fecha, 7, 4) || '-' || substr(fecha, 4, 2) || '-' || substr(fecha, 1, 2)) >= date('now', ?) "
+            "GROUP BY pais",
+            (f"-{int(dias)} days",)
+        )
+        return dict(filas.fetchall())
+
+    def guardar(self, alertas):
+        """
+        Inserta o actualiza un lote de alertas en una sola transacción
+
+        Args:
+            alertas: Iterable de Alerta
+
+        Returns:
+            int: Cantidad de filas escritas
+        """
+        filas = [tuple(getattr(alerta, col) for col in COLUMNAS) for alerta in alertas if alerta.url]
+        if not filas:
+            return 0
+
+        columnas = ", ".join(COLUMNAS)
+        marcadores = ", ".join("?" * len(COLUMNAS))
+        actualizaciones = ", ".join(f"{col} = COALESCE(excluded.{col}, {col})" for col in COLUMNAS if col != 'url')
+
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO alertas ({columnas}) VALUES ({marcadores}) "
+                f"ON CONFLICT(url) DO UPDATE SET {actualizaciones}",
+                filas
+            )
+            # En la misma transacción: una novedad que llega al historial sale de la cola de etapas
+            self.conn.executemany("DELETE FROM pendientes WHERE url = ?", [(fila[0],) for fila in filas])
+        return len(filas)
+
+    def sin_resumen(self, limite, max_intentos, espera_horas):
+        """
+        Alertas que quedaron sin resumen o con el título como fallback, para re-resumirlas.
+        Primero las menos intentadas y, entre ellas, las más recientes; una alerta ya intentada
+        no vuelve a salir hasta pasadas `espera_horas`.
+
+        Returns:
+            list: Hasta `limite` Alertas
+        """
+        columnas = ", ".join(COLUMNAS)
+        filas = self.conn.execute(
+            f"SELECT {columnas} FROM alertas "
+            f"WHERE {CONDICION_SIN_RESUMEN} AND resumen_intentos < ? "
+            f"AND (resumen_intento IS NULL OR resumen_intento < datetime('now', ?)) "
+            f"ORDER BY resumen_intentos, id DESC LIMIT ?",
+            (max_intentos, f"-{int(espera_horas)} hours", limite)
+        )
+        return [Alerta(**dict(zip(COLUMNAS, fila))) for fila in filas]
+
+    def registrar_resumenes(self, alertas):
+        """
+        Actualiza en el lugar el resumen de alertas re-resumidas y cuenta el intento en cada una;
+        las que siguen sin resumen propio (None o el título) conservan el que tenían
+
+        Returns:
+            int: Cantidad de resúmenes actualizados
+        """
+        filas = []
+        actualizados = 0
+        for alerta in alertas:
+            nuevo = alerta.resumen if alerta.resumen and alerta.resumen != alerta.titulo else None
+            actualizados += nuevo is not None
+            filas.append((nuevo, alerta.url))
+
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE alertas SET resumen = COALESCE(?, resumen), resumen_intentos = resumen_intentos + 1, "
+                "resumen_intento = CURRENT_TIMESTAMP WHERE url = ?",
+                filas
+            )
+        return actualizados
+
+    def importar_csv(self, ruta_csv=ARCHIVO_CSV_LEGADO):
+        """
+        Importa el historial CSV anterior (migración de una sola vez)
+
+        Returns:
+            int: Cantidad de filas importadas
+        """
+        with open(ruta_csv, 'r', encoding='utf-8', newline='') as f:
+            lector = csv.DictReader(f)
+            alertas = []
+            for fila in lector:
+                alerta = Alerta(**{col: (fila.get(col) or None) for col in COLUMNAS})
+                # Mismas normalizaciones que hacía la migración al vuelo del CSV
+                alerta.pais = alerta.pais or "Desconocido"
+                alerta.resumen = alerta.resumen or ""
+                alertas.append(alerta)
+        return self.guardar(alertas)
+
+    def cerrar(self):
+        # Al cerrar la última conexión SQLite vuelca el WAL al archivo principal
+        self.conn.close()
+
+class ColaEtapas:
+    """
+    Cola durable de novedades en la tabla pendientes del historial: cada novedad se registra al
+    detectarse y avanza por extraccion → resumen → envio → historial a medida que termina cada
+    etapa, guardando el texto extraído y el resumen. Un run que se corta (caída o plazo vencido)
+    deja la cola tal cual y el siguiente retoma cada novedad desde la etapa que le falta, sin
+    repetir resúmenes ni envíos ya hechos. La novedad sale de la cola al guardarse en el historial.
+
+    Usa su propia conexión con un lock: la actualizan los hilos de extracción y el emisor de Telegram.
+    """
+
+    def __init__(self, ruta=ARCHIVO_BD):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        _preparar_base(self.conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cerrar()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
+
+    def encolar(self, alertas):
+        """
+        Registra novedades recién detectadas en la primera etapa (las que ya están en cola no cambian)
+
+        Returns:
+            int: Cantidad de novedades encoladas
+        """
+        filas = [tuple(getattr(alerta, col) for col in COLUMNAS) for alerta in alertas if alerta.url]
+        if not filas:
+            return 0
+
+        columnas = ", ".join(COLUMNAS)
+        marcadores = ", ".join("?" * len(COLUMNAS))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO pendientes ({columnas}) VALUES ({marcadores}) ON CONFLICT(url) DO NOTHING",
+                filas
+            )
+        return len(filas)
+
+    def pendientes(self):
+        """
+        Returns:
+            list: Pares (Alerta, etapa) de la cola, de la más antigua a la más nueva; la alerta
+                trae el resumen si ya se generó
+        """
+        columnas = ", ".join(COLUMNAS)
+        with self._lock:
+            filas = self.conn.execute(f"SELECT {columnas}, etapa FROM pendientes ORDER BY registrado, rowid").fetchall()
+        return [(Alerta(**dict(zip(COLUMNAS, fila))), fila[-1]) for fila in filas]
+
+    def contenido(self, url):
+        """Texto ya extraído de la novedad, o None si todavía no se extrajo"""
+        with self._lock:
+            fila = self.conn.execute("SELECT contenido FROM pendientes WHERE url = ?", (url,)).fetchone()
+        return fila[0] if fila else None
+
+    def avanzar(self, alertas, etapa, contenido=None):
+        """
+        Pasa novedades a la etapa indicada, guardando su resumen y, si se da, el texto extraído
+
+        Args:
+            alertas: Iterable de Alerta
+            etapa: Próxima etapa que les falta (una de ETAPAS)
+            contenido: Texto extraído (solo al terminar la extracción de una sola novedad)
+        """
+        if etapa not in ETAPAS:
+            raise ValueError(f"Etapa desconocida: {etapa}")
+        filas = [(etapa, alerta.resumen, contenido, alerta.url) for alerta in alertas if alerta.url]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE pendientes SET etapa = ?, resumen = COALESCE(?, resumen), contenido = COALESCE(?, contenido) "
+                "WHERE url = ?",
+                filas
+            )
+
+    def diferir(self, alertas, motivo):
+        """Anota por qué quedaron novedades en la cola al terminar el run y cuántos runs llevan"""
+        filas = [(motivo, alerta.url) for alerta in alertas if alerta.url]
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE pendientes SET motivo = ?, intentos = intentos + 1 WHERE url = ?", filas)
+        return len(filas)
+
+    def cerrar(self):
+        with self._lock:
+            self.conn.close()
+
+def abrir_historial(ruta=ARCHIVO_BD, ruta_csv=ARCHIVO_CSV_LEGADO):
+    """Abre el historial e importa el CSV legado si la base está vacía"""
+    historial = HistorialAlertas(ruta)
+    if len(historial) == 0 and os.path.exists(ruta_csv):
+        importadas = historial.importar_csv(ruta_csv)
+        print(f"Historial CSV importado a SQLite: {importadas} registros")
+    return historial
+
+if __name__ == "__main__":
+    # Uso: python history_store.py [ruta_csv]
+    ruta_csv = sys.argv[1] if len(sys.argv) > 1 else ARCHIVO_CSV_LEGADO
+    with HistorialAlertas() as historial:
+        importadas = historial.importar_csv(ruta_csv)
+        print(f"Importadas {importadas} filas desde {ruta_csv}. Total en historial: {len(historial)}")
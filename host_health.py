@@ -0,0 +1,163 @@
+import json
+import os
+import random
+import threading
+import time
+from curl_cffi.requests.exceptions import Timeout
+import metrics
+from data_dir import DIR_DATOS
+
+ARCHIVO_SALUD_HOSTS = os.path.join(DIR_DATOS, 'salud_hosts.json')
+
+# Circuit breaker por host
+UMBRAL_FALLAS = 3                      # Fallas seguidas (entre runs) que abren el circuito
+ENFRIAMIENTO_BASE_SEGUNDOS = 30 * 60   # Tiempo sin pedir al host tras abrirse el circuito
+ENFRIAMIENTO_MAXIMO_SEGUNDOS = 6 * 3600
+TIMEOUT_SONDEO = 8                     # Timeout corto del request de prueba con el circuito medio abierto
+
+# Reintentos con backoff y jitter ante fallas transitorias (no ante timeouts: ya consumieron su espera)
+MAX_REINTENTOS = 2
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 10.0
+# 0: curl devolvió una respuesta sin status (conexión cortada antes de recibir cabeceras)
+CODIGOS_TRANSITORIOS = {0, 429, 502, 503, 504}
+
+class HostNoDisponible(Exception):
+    """El circuito del host está abierto: el request se omite sin esperar al timeout"""
+
+def es_falla(response=None, error=None):
+    """Un error de red, un 5xx, un 429 o una respuesta sin status cuentan como falla del host; un 404 no"""
+    if error is not None:
+        return True
+    return response.status_code >= 500 or response.status_code in CODIGOS_TRANSITORIOS
+
+def es_transitoria(response=None, error=None):
+    """Fallas que vale la pena reintentar enseguida"""
+    if error is not None:
+        return not isinstance(error, Timeout)
+    return response.status_code in CODIGOS_TRANSITORIOS
+
+def espera_reintento(intento, response=None):
+    """Backoff exponencial con jitter; respeta Retry-After si el servidor lo envía (con tope)"""
+    espera = ESPERA_BASE_SEGUNDOS * 2 ** intento * random.uniform(0.5, 1.0)
+    if response is not None:
+        try:
+            espera = max(espera, float(response.headers.get('Retry-After')))
+        except (TypeError, ValueError):
+            pass
+    return min(espera, ESPERA_MAXIMA_SEGUNDOS)
+
+class SaludHosts:
+    """
+    Estado de salud de cada host, persistido entre runs, con un circuit breaker:
+    - cerrado: los requests pasan; cada falla suma a las fallas consecutivas del host,
+    - abierto: tras UMBRAL_FALLAS fallas seguidas el host se omite hasta que vence el enfriamiento,
+      que se duplica con cada reapertura por un sondeo fallido (hasta ENFRIAMIENTO_MAXIMO_SEGUNDOS),
+    - medio abierto: vencido el enfriamiento pasa un solo request de prueba con TIMEOUT_SONDEO;
+      si responde el circuito se cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, ruta=ARCHIVO_SALUD_HOSTS):
+        self.ruta = ruta
+        self._hosts = self._cargar()
+        self._sondeando = set()
+        self._avisados = set()
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[!] Error cargando salud de hosts, se ignora: {e}")
+            return {}
+
+    def preparar(self, host, opciones):
+        """
+        Aplica el estado del circuito a las opciones de un request
+
+        Returns:
+            dict: Opciones a usar (con timeout corto si el request es un sondeo)
+
+        Raises:
+            HostNoDisponible: Si el circuito está abierto o ya hay un sondeo en curso
+        """
+        ahora = time.time()
+        with self._lock:
+            estado = self._hosts.get(host)
+            if not estado or estado.get('abierto_hasta', 0) == 0:
+                return opciones
+
+            if ahora < estado['abierto_hasta'] or host in self._sondeando:
+                metrics.contar('circuito_omitidos', host=host)
+                if host not in self._avisados and host not in self._sondeando:
+                    self._avisados.add(host)
+                    restante = (estado['abierto_hasta'] - ahora) / 60
+                    print(f"    [x] Circuito abierto para {host} ({estado['fallas']} fallas seguidas), "
+                          f"se omite por {restante:.0f} min más")
+                raise HostNoDisponible(f"{host} no disponible (circuito abierto)")
+
+            self._sondeando.add(host)
+
+        print(f"    [?] Sondeando {host} con timeout de {TIMEOUT_SONDEO}s")
+        return {**opciones, 'timeout': min(opciones.get('timeout', TIMEOUT_SONDEO), TIMEOUT_SONDEO)}
+
+    def cancelar(self, host):
+        """Libera el sondeo de un request cancelado antes de terminar (sigue medio abierto)"""
+        with self._lock:
+            self._sondeando.discard(host)
+
+    def registrar(self, host, response=None, error=None):
+        """Registra el resultado final de un request (después de sus reintentos)"""
+        ahora = time.time()
+        with self._lock:
+            self._sondeando.discard(host)
+            estado = self._hosts.setdefault(host, {'fallas': 0, 'abierto_hasta': 0})
+
+            if not es_falla(response, error):
+                if estado['fallas']:
+                    print(f"    [✓] {host} respondió de nuevo tras {estado['fallas']} fallas")
+                estado.update(fallas=0, aperturas=0, abierto_hasta=0, ultimo_exito=ahora)
+                return
+
+            estado['fallas'] += 1
+            estado['ultima_falla'] = ahora
+            estado['ultimo_error'] = (f"{error.__class__.__name__}: {error}" if error else f"HTTP {response.status_code}")[:200]
+
+            # Los requests concurrentes que fallan con el circuito ya abierto no lo extienden
+            if estado['fallas'] >= UMBRAL_FALLAS and estado['abierto_hasta'] <= ahora:
+                estado['aperturas'] = estado.get('aperturas', 0) + 1
+                enfriamiento = min(ENFRIAMIENTO_BASE_SEGUNDOS * 2 ** (estado['aperturas'] - 1), ENFRIAMIENTO_MAXIMO_SEGUNDOS)
+                estado['abierto_hasta'] = ahora + enfriamiento
+                metrics.contar('circuito_aperturas', host=host)
+                print(f"    [x] Abriendo circuito de {host} por {enfriamiento / 60:.0f} min: {estado['ultimo_error']}")
+
+    def resumen(self):
+        """Hosts con fallas: host -> (fallas seguidas, circuito abierto)"""
+        ahora = time.time()
+        with self._lock:
+            return {host: (estado['fallas'], estado.get('abierto_hasta', 0) > ahora)
+                    for host, estado in self._hosts.items() if estado.get('fallas')}
+
+    def guardar(self):
+        with self._lock:
+            self._avisados.clear()
+            datos = json.dumps(self._hosts, ensure_ascii=False, indent=2, sort_keys=True)
+        try:
+            with open(self.ruta, 'w', encoding='utf-8') as f:
+                f.write(datos)
+        except Exception as e:
+            print(f"[!] Error guardando salud de hosts: {e}")
+
+_salud = None
+_lock_salud = threading.Lock()
+
+def obtener_salud():
+    """Estado de salud compartido por el proceso (lo usan el motor async y el cliente síncrono)"""
+    global _salud
+    with _lock_salud:
+        if _salud is None:
+            _salud = SaludHosts()
+    return _salud
@@ -0,0 +1,92 @@
+import json
+import os
+import hashlib
+from data_dir import DIR_DATOS
+
+ARCHIVO_CACHE_HTTP = os.path.join(DIR_DATOS, 'cache_http.json')
+
+class CacheValidadores:
+    """
+    Cache persistente de validadores HTTP (ETag / Last-Modified) y hash del cuerpo por URL.
+
+    Permite pedir los listados con GET condicional y saltar el parseo cuando la fuente no cambió.
+    Los validadores de una respuesta nueva quedan sin confirmar hasta que su listado se parsea bien
+    (confirmar); recién ahí pasan a pendientes, que guardar() escribe cuando las novedades ya están
+    en el historial. Si el parseo o el run fallan antes, el próximo run vuelve a parsear el listado.
+    """
+
+    def __init__(self, ruta=ARCHIVO_CACHE_HTTP):
+        self.ruta = ruta
+        self._entradas = self._cargar()
+        self._sin_confirmar = {}
+        self._pendientes = {}
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[!] Error cargando cache HTTP, se ignora: {e}")
+            return {}
+
+    def cabeceras(self, url):
+        """Cabeceras If-None-Match / If-Modified-Since para la URL, si hay validadores guardados"""
+        entrada = self._entradas.get(url, {})
+        headers = {}
+        if entrada.get('etag'):
+            headers['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            headers['If-Modified-Since'] = entrada['last_modified']
+        return headers
+
+    def sin_cambios(self, url, response):
+        """
+        Indica si la respuesta corresponde a contenido ya procesado
+
+        Args:
+            url: URL pedida
+            response: Respuesta del GET condicional
+
+        Returns:
+            bool: True si el servidor respondió 304 o el cuerpo tiene el mismo hash que la última vez
+        """
+        if response.status_code == 304:
+            return True
+        if response.status_code != 200:
+            return False
+
+        hash_cuerpo = hashlib.sha256(response.content).hexdigest()
+        if self._entradas.get(url, {}).get('hash') == hash_cuerpo:
+            return True
+
+        self._sin_confirmar[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': hash_cuerpo
+        }
+        return False
+
+    def confirmar(self, url):
+        """Marca como procesado el listado de la URL: sus validadores se guardan con guardar()"""
+        if url in self._sin_confirmar:
+            self._pendientes[url] = self._sin_confirmar.pop(url)
+
+    def descartar(self, urls):
+        """Olvida los validadores de esas URLs (listados cuyo scraper falló o no terminó)"""
+        for url in urls:
+            self._sin_confirmar.pop(url, None)
+            self._pendientes.pop(url, None)
+
+    def guardar(self):
+        """Confirma los validadores pendientes y los escribe a disco"""
+        if not self._pendientes:
+            return
+        self._entradas.update(self._pendientes)
+        self._pendientes = {}
+        try:
+            with open(self.ruta, 'w', encoding='utf-8') as f:
+                json.dump(self._entradas, f, ensure_ascii=False, indent=2, sort_keys=True)
+        except Exception as e:
+            print(f"[!] Error guardando cache HTTP: {e}")
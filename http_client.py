@@ -0,0 +1,126 @@
+import os
+import time
+from urllib.parse import urlparse
+from curl_cffi.requests import Session, AsyncSession
+import host_health
+import metrics
+
+# Configuración centralizada de todas las peticiones HTTP
+IMPERSONATE = "chrome110"
+HTTP_VERSION = "v2tls"  # HTTP/2 si el servidor lo negocia por ALPN, si no HTTP/1.1
+
+# Timeouts (segundos) según el tipo de recurso
+TIMEOUTS = {
+    'feed': 30,
+    'listado': 20,
+    'detalle': 10,
+    'html': 15,
+    'pdf': 20
+}
+
+# Sitios lentos que necesitan más margen que el de su tipo de recurso
+TIMEOUTS_POR_HOST = {
+    'antigo.anvisa.gov.br': 30
+}
+
+# Sitios con certificados incompletos o vencidos: no se verifica SSL
+HOSTS_SIN_VERIFICACION = {
+    'www.digemid.minsa.gob.pe',
+    'www.ispch.gob.cl',
+    'antigo.anvisa.gov.br',
+    'www.argentina.gob.ar',
+    'apiwww.agemed.gob.bo',
+    'www.agemed.gob.bo',
+    'www.ministeriodesalud.go.cr'
+}
+
+# Servidor de replay local (benchmarks/replay_server.py): si está definido, todas las fuentes se piden a él
+URL_REPLAY = os.environ.get('URL_REPLAY')
+
+_session = None
+
+def resolver_url(url):
+    """URL a pedir realmente: la original, o su equivalente en el servidor de replay (/host/ruta?query)"""
+    if not URL_REPLAY:
+        return url
+    partes = urlparse(url)
+    consulta = f"?{partes.query}" if partes.query else ""
+    return f"{URL_REPLAY.rstrip('/')}/{partes.netloc}{partes.path}{consulta}"
+
+def opciones_request(url, tipo='listado', **kwargs):
+    """
+    Completa los parámetros de un request con la configuración centralizada
+
+    Args:
+        url: URL a consultar
+        tipo: Tipo de recurso ('feed', 'listado', 'detalle', 'html', 'pdf')
+        **kwargs: Parámetros explícitos, tienen prioridad sobre los por defecto
+
+    Returns:
+        dict: Parámetros listos para session.get
+    """
+    host = urlparse(url).netloc
+    kwargs.setdefault('timeout', TIMEOUTS_POR_HOST.get(host, TIMEOUTS.get(tipo, 20)))
+    kwargs.setdefault('verify', host not in HOSTS_SIN_VERIFICACION)
+    return kwargs
+
+def obtener_sesion():
+    """Sesión síncrona compartida (curl_cffi mantiene un handle por hilo con su pool keep-alive)"""
+    global _session
+    if _session is None:
+        _session = Session(impersonate=IMPERSONATE, http_version=HTTP_VERSION)
+    return _session
+
+def crear_sesion_async(max_clients=10):
+    """Sesión asíncrona con la misma configuración que la síncrona"""
+    return AsyncSession(impersonate=IMPERSONATE, http_version=HTTP_VERSION, max_clients=max_clients)
+
+def anotar_respuesta(span, url, response, stream=False):
+    """Status, URL y bytes de una respuesta en su span (en streaming, solo si el servidor los declara)"""
+    span.etiquetas['status'] = response.status_code
+    span.datos['url'] = url
+    largo = response.headers.get('Content-Length', '')
+    if largo.isdigit():
+        span.datos['bytes'] = int(largo)
+    elif not stream:
+        span.datos['bytes'] = len(response.content)
+
+def get(url, tipo='listado', **kwargs):
+    """
+    GET síncrono reutilizando las conexiones abiertas de la sesión compartida.
+    Pasa por el circuit breaker del host y reintenta con backoff las fallas transitorias.
+
+    Raises:
+        host_health.HostNoDisponible: Si el circuito del host está abierto
+    """
+    host = urlparse(url).netloc
+    salud = host_health.obtener_salud()
+    opciones = salud.preparar(host, opciones_request(url, tipo, **kwargs))
+
+    for intento in range(host_health.MAX_REINTENTOS + 1):
+        response, error = None, None
+        try:
+            with metrics.span('http', host=host, tipo=tipo) as span:
+                response = obtener_sesion().get(resolver_url(url), **opciones)
+                anotar_respuesta(span, url, response, opciones.get('stream', False))
+        except Exception as e:
+            error = e
+
+        if intento == host_health.MAX_REINTENTOS or not host_health.es_transitoria(response, error):
+            break
+        if response is not None:
+            response.close()
+        metrics.contar('http_reintentos', host=host)
+        time.sleep(host_health.espera_reintento(intento, response))
+
+    salud.registrar(host, response, error)
+    if error is not None:
+        raise error
+    return response
+
+def cerrar():
+    """Cierra la sesión compartida y sus conexiones"""
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
@@ -0,0 +1,87 @@
+"""
+Costo de arranque de main.py: tiempo de importación por módulo y verificación de presupuesto.
+
+Uso:
+    python import_budget.py                    # reporte de los módulos más costosos
+    python import_budget.py --presupuesto 1000 # además falla (exit 1) si el arranque supera 1000 ms
+                                               # o si se cargó alguna dependencia diferida
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODULO_ENTRADA = 'main'
+PRESUPUESTO_MS = 1000
+REPETICIONES = 3
+
+# Dependencias pesadas que main.py solo importa en los caminos que las usan
+MODULOS_DIFERIDOS = ['pandas', 'fitz', 'pymupdf', 'google.genai']
+
+def medir(modulo=MODULO_ENTRADA):
+    """
+    Importa el módulo en un proceso nuevo con -X importtime
+
+    Returns:
+        dict: nombre de módulo -> (tiempo propio en µs, tiempo acumulado en µs)
+    """
+    # main.py termina si no hay credenciales: para medir basta con valores de relleno
+    env = dict(os.environ)
+    env.setdefault('TELEGRAM_TOKEN', 'x')
+    env.setdefault('TELEGRAM_CHAT_ID', 'x')
+
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{resultado.stderr[-2000:]}")
+
+    tiempos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        tiempos[nombre.strip()] = (int(propio), int(acumulado))
+    return tiempos
+
+def medir_minimo(modulo=MODULO_ENTRADA, repeticiones=REPETICIONES):
+    """La medición más rápida de varias (la primera además compila los .pyc)"""
+    medir(modulo)
+    mediciones = [medir(modulo) for _ in range(repeticiones)]
+    return min(mediciones, key=lambda tiempos: tiempos[modulo][1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación de main.py por módulo")
+    parser.add_argument('--presupuesto', type=float, default=None, help="Máximo aceptado en ms (activa la verificación)")
+    parser.add_argument('--top', type=int, default=15, help="Cantidad de módulos a listar")
+    args = parser.parse_args()
+
+    tiempos = medir_minimo()
+    total_ms = tiempos[MODULO_ENTRADA][1] / 1000
+
+    print(f"Arranque de {MODULO_ENTRADA}: {total_ms:.0f} ms (mínimo de {REPETICIONES} mediciones)")
+    print("Módulos más costosos (tiempo acumulado):")
+    ranking = sorted(
+        ((nombre, acumulado) for nombre, (_, acumulado) in tiempos.items() if nombre != MODULO_ENTRADA),
+        key=lambda item: item[1], reverse=True
+    )
+    for nombre, acumulado in ranking[:args.top]:
+        print(f"  {acumulado / 1000:8.1f} ms  {nombre}")
+
+    diferidos = [m for m in MODULOS_DIFERIDOS if m in tiempos]
+    if diferidos:
+        print(f"[!] Dependencias diferidas cargadas al arrancar: {', '.join(diferidos)}")
+
+    if args.presupuesto is None:
+        return 0
+    excedido = total_ms > args.presupuesto
+    if excedido:
+        print(f"[!] Presupuesto de arranque excedido: {total_ms:.0f} ms > {args.presupuesto:.0f} ms")
+    if excedido or diferidos:
+        return 1
+    print(f"  ✓ Dentro del presupuesto de {args.presupuesto:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
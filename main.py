@@ -1,28 +1,38 @@
+import argparse
+import asyncio
 import os
 import sys
-import time  # Import time for delays
+import time
+from collections import Counter
 from dotenv import load_dotenv, find_dotenv
-import pandas as pd
-import requests
 from scraper import scrape_peru, scrape_chile, scrape_brasil, scrape_colombia, scrape_mexico, scrape_argentina, scrape_bolivia, scrape_costarica
-import concurrent.futures
+from async_engine import AsyncEngine, ejecutar_scrapers
+import backfill
+from http_cache import CacheValidadores
+from host_health import obtener_salud
+from history_store import ColaEtapas, abrir_historial
+from pipeline import LimitadorGemini, procesar_novedades
+from run_budget import BloqueoRun, PlazoRun
+from scheduler import Planificador, VENTANA_HISTORIAL_DIAS
+from telegram_service import EmisorTelegram
+import metrics
 import html
-from content_extractor import extract_content
-from gemini_service import generar_resumen
 
 # Cargar variables de entorno
 load_dotenv(find_dotenv(), override=True)
 
 # Configuración Global
-ARCHIVO_HISTORIAL = "noticias_historial.csv"
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID')
-SILENT_MODE = False # [IMPORTANTE] Si es True, guarda en CSV pero NO envía a Telegram
+SILENT_MODE = False # [IMPORTANTE] Si es True, guarda en la base de historial pero NO envía a Telegram
 
 if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
     print("Error: Variables de entorno no configuradas")
     sys.exit(1)
 
+# Cola de envíos con sesión reutilizada y control de los límites de Telegram
+EMISOR_TELEGRAM = EmisorTelegram(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+
 LISTA_DE_SCRAPERS = [
     scrape_peru,
     scrape_chile,
@@ -34,6 +44,18 @@ LISTA_DE_SCRAPERS = [
     scrape_costarica
 ]
 
+# País de las alertas de cada scraper (para programar cada fuente en modo daemon)
+PAIS_POR_SCRAPER = {
+    'scrape_peru': 'Perú',
+    'scrape_chile': 'Chile',
+    'scrape_brasil': 'Brasil',
+    'scrape_colombia': 'Colombia',
+    'scrape_mexico': 'México',
+    'scrape_argentina': 'Argentina',
+    'scrape_bolivia': 'Bolivia',
+    'scrape_costarica': 'Costa Rica'
+}
+
 def obtener_bandera(pais):
     banderas = {
         'Perú': '🇵🇪',
@@ -47,154 +69,272 @@ def obtener_bandera(pais):
     }
     return banderas.get(pais, '🌎')
 
-def enviar_telegram(mensaje):
+def enviar_telegram(mensaje, noticia=None):
     if SILENT_MODE:
         print("  > [SILENT MODE] Mensaje omitido (no enviado a Telegram).")
         return
 
-    print("Enviando mensaje...")
-    url_bot = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {"chat_id": TELEGRAM_CHAT_ID, "text": mensaje, "parse_mode": "HTML", "disable_web_page_preview": True}
+    print("Encolando mensaje...")
+    EMISOR_TELEGRAM.encolar(mensaje, noticia)
+
+def formatear_mensaje(noticia):
+    # Evitar error de caracteres especiales
+    resumen_seguro = html.escape(str(noticia.resumen))
+    institucion_segura = html.escape(str(noticia.institucion))
+    
+    # Logica inteligente de enlaces
+    link_web = noticia.url
+    link_pdf = noticia.pdf
+
+    texto_enlaces = ""
+    # Caso A: Ambos enlaces disponibles (prioridad a web)
+    if link_web and link_pdf:
+        texto_enlaces = f"🔗 {link_web}"
+    # Caso B: Solo Web
+    elif link_web:
+        texto_enlaces = f"🔗 {link_web}"
+    # Caso C: Solo PDF
+    elif link_pdf:
+        texto_enlaces = f"📥 {link_pdf}"
+
+    bandera = obtener_bandera(noticia.pais)
+    return (
+        f"{bandera} <b>NUEVA ALERTA - {noticia.pais}</b>\n"
+        f"🏛 <b>Institución:</b> {institucion_segura}\n"
+        f"📅 <b>Fecha:</b> {noticia.fecha}\n\n"
+        f"⚠️ <b>{resumen_seguro}</b>\n\n"
+        f"{texto_enlaces}"
+    )
+
+def notificar_alerta(noticia):
+    print(f"Enviando alerta a Telegram...")
+    enviar_telegram(formatear_mensaje(noticia), noticia)
+
+def ejecutar_flujo(scrapers=LISTA_DE_SCRAPERS, runner=None, engine=None, limitador=None):
+    """
+    Un ciclo completo: scraping → detección de novedades → resumen y envío → historial.
+    Cada novedad avanza por una cola durable (history_store.ColaEtapas): lo que no termina, por una
+    caída o por el plazo del ciclo (run_budget.PlazoRun), se retoma en el próximo ciclo desde la
+    etapa que le falta, antes que las novedades nuevas.
+    Al terminar agrega los spans y contadores del ciclo al reporte de métricas (metrics.py).
+
+    Args:
+        scrapers: Scrapers a ejecutar en este ciclo (por defecto todos)
+        runner, engine, limitador: Recursos de larga vida del modo daemon (ver ejecutar_daemon)
+
+    Returns:
+        list: Novedades procesadas en el ciclo
+    """
     try:
-        requests.post(url_bot, data=data)
-        print(f"  > Enviado a {TELEGRAM_CHAT_ID}")
-    except Exception as e:
-        print(f"  > Error enviando a {TELEGRAM_CHAT_ID}: {e}")
+        with metrics.span('ciclo', modo='daemon' if runner else 'unico') as span:
+            novedades = _ejecutar_ciclo(scrapers, runner, engine, limitador)
+            span.datos['novedades'] = len(novedades)
+            return novedades
+    finally:
+        # El estado de los hosts se guarda aunque el ciclo falle: el próximo run no insiste con ellos
+        salud = obtener_salud()
+        salud.guardar()
+        for host, (fallas, abierto) in salud.resumen().items():
+            print(f"[!] Host con fallas: {host} ({fallas} seguidas{', circuito abierto' if abierto else ''})")
+        lentos = metrics.METRICAS.mas_lentos('scraper', 3)
+        if lentos:
+            print("Fuentes más lentas: " + ", ".join(f"{s.etiquetas['fuente']} {s.duracion:.1f}s" for s in lentos))
+        metrics.METRICAS.volcar()
+
+def _ejecutar_ciclo(scrapers, runner, engine, limitador):
+    plazo = PlazoRun()
 
-def ejecutar_flujo():
-    # 1. Cargar el historial
+    # 1. Abrir el historial (SQLite; la primera vez importa el CSV legado) y la cola de etapas
+    historial = abrir_historial()
+    cola = ColaEtapas()
+    # Cada envío confirmado por Telegram queda registrado enseguida: tras una caída no se reenvía
+    EMISOR_TELEGRAM.al_enviar = lambda noticias: cola.avanzar(noticias, 'historial')
     try:
-        df_historico = pd.read_csv(ARCHIVO_HISTORIAL)
-        print(f"Historial cargado: {len(df_historico)} registros")
-        
-        # Normalizar historial si faltan columnas (migración al vuelo)
-        if 'resumen' not in df_historico.columns:
-             print("Agregando columna 'resumen' al historial existente en memoria...")
-             df_historico['resumen'] = ""
-        if 'pais' not in df_historico.columns:
-             print("Agregando columna 'pais' al historial existente en memoria...")
-             df_historico['pais'] = "Desconocido"
-
-    except FileNotFoundError:
-        df_historico = pd.DataFrame(columns=["url", "titulo", "fecha", "pais", "institucion", "resumen"])
-        print("Historial no encontrado, creando nuevo archivo...")
+        return _procesar_ciclo(scrapers, runner, engine, limitador, plazo, historial, cola)
+    finally:
+        EMISOR_TELEGRAM.al_enviar = None
+        cola.cerrar()
+        historial.cerrar()
+
+def _procesar_ciclo(scrapers, runner, engine, limitador, plazo, historial, cola):
+    print(f"Historial cargado: {len(historial)} registros")
+
+    # Novedades de runs anteriores que no terminaron (caída o plazo vencido), con la etapa que les falta
+    pendientes = cola.pendientes()
+    if pendientes:
+        etapas = Counter(etapa for _, etapa in pendientes)
+        print(f"Cola de etapas: {len(pendientes)} novedades pendientes de runs anteriores "
+              f"({', '.join(f'{cantidad} en {etapa}' for etapa, cantidad in etapas.items())})")
+        # Las ya enviadas solo necesitaban llegar al historial
+        ya_enviadas = [alerta for alerta, etapa in pendientes if etapa == 'historial']
+        historial.guardar(ya_enviadas)
+        pendientes = [alerta for alerta, etapa in pendientes if etapa != 'historial']
 
     # 2. Recolectar noticias candidatas
-    noticias_candidatas = []
-    
-    # Ejecución paralela con ThreadPoolExecutor
-    print(f"Iniciando scraping paralelo con {len(LISTA_DE_SCRAPERS)} scrapers...")
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Enviamos todas las funciones a ejecutarse
-        futuros = [executor.submit(scraper) for scraper in LISTA_DE_SCRAPERS]
-        
-        # Recogemos los resultados a medida que completan
-        for futuro in concurrent.futures.as_completed(futuros):
-            try:
-                resultado = futuro.result()
-                if resultado:
-                    noticias_candidatas.extend(resultado)
-            except Exception as e:
-                print(f"  -> [ERROR CRÍTICO] Un scraper falló inesperadamente: {e}")
-
-    if not noticias_candidatas:
+    # Ejecución asíncrona: cada fuente, categoría y detalle es una corrutina
+    # Los listados sin cambios desde el último run (304 / mismo hash) no se parsean
+    cache_http = CacheValidadores()
+    print(f"Iniciando scraping asíncrono con {len(scrapers)} scrapers...")
+    # El historial se pasa a los scrapers para no descargar detalles ya vistos (búsqueda indexada)
+    with metrics.span('etapa', etapa='scraping'):
+        noticias_candidatas = ejecutar_scrapers(scrapers, cache=cache_http, urls_conocidas=historial, engine=engine, runner=runner,
+                                                plazo=plazo.presupuesto('scraping'))
+    metrics.contar('candidatas', len(noticias_candidatas))
+
+    if not noticias_candidatas and not pendientes:
         print("No se encontraron noticias candidatas")
-        return
+        cache_http.guardar()
+        return []
 
-    df_candidatos = pd.DataFrame(noticias_candidatas)
+    # 3. Detección de cambios: primera aparición de cada URL, sin las ya registradas ni las ya en cola
+    candidatas = {}
+    for alerta in noticias_candidatas:
+        if alerta.url:
+            candidatas.setdefault(alerta.url, alerta)
 
-    # 3. Detección de cambios
-    
-    # Normalizamos df_candidatos para que tenga las mismas columnas si hace falta
-    if 'resumen' not in df_candidatos.columns:
-        df_candidatos['resumen'] = df_candidatos['titulo'] # Valor temporal
-        
-    url_historicas = df_historico['url']
-    df_novedades = df_candidatos[~df_candidatos['url'].isin(url_historicas)]
-
-    print(f"Se encontraron {len(df_novedades)} novedades")
-
-    if not df_novedades.empty:
-        # 4. Procesar y enviar alertas
-        novedades_con_resumen = []
-        
-        for index, noticia in df_novedades.iterrows():
-            print(f"\nProcesando alerta para {noticia['pais']} - {noticia['titulo'][:50]}...")
-            
-            # 4.1. Extraer contenido y generar resumen
-            resumen = noticia['titulo']  # Fallback por defecto
-            
-            try:
+    with metrics.span('etapa', etapa='deteccion'):
+        url_historicas = historial.urls_existentes(candidatas)
+    urls_pendientes = {alerta.url for alerta in pendientes}
+    novedades = [alerta for url, alerta in candidatas.items() if url not in url_historicas and url not in urls_pendientes]
+    for pais, cantidad in Counter(alerta.pais for alerta in novedades).items():
+        metrics.contar('novedades', cantidad, pais=pais)
+
+    print(f"Se encontraron {len(novedades)} novedades")
+    # Las novedades quedan en disco antes de empezar a procesarlas
+    cola.encolar(novedades)
+    # Lo pendiente va primero: es lo más antiguo y parte ya tiene resumen
+    novedades = pendientes + novedades
+    novedades_con_resumen = []
+
+    if novedades:
+        # Extracción (fitz) y resúmenes (google-genai) solo se importan si hay novedades
+        from content_extractor import extract_content
+        from gemini_service import generar_resumen, generar_resumenes_lote, resumen_en_cache, resumen_estadisticas
+
+        def extraer(noticia):
+            # El texto extraído por un run anterior no se vuelve a descargar
+            contenido = cola.contenido(noticia.url)
+            if contenido is None:
                 contenido = extract_content(noticia)
-                
                 if contenido:
-                    print(f"  ✓ Contenido extraído: {len(contenido)} caracteres")
-                    resumen = generar_resumen(contenido, noticia['titulo'])
-                else:
-                    print(f"  ! No se pudo extraer contenido, usando título original")
-                    resumen = noticia['titulo']
-            except Exception as e:
-                print(f"  ! Error en extracción/resumen: {e}")
-                resumen = noticia['titulo']
-            
-            # Agregar resumen a la noticia
-            noticia_dict = noticia.to_dict()
-            noticia_dict['resumen'] = resumen
-            novedades_con_resumen.append(noticia_dict)
-            
-            # 4.2. Preparar y enviar mensaje a Telegram
-            print(f"Enviando alerta a Telegram...")
-            
-            # Evitar error de caracteres especiales
-            resumen_seguro = html.escape(str(resumen))
-            institucion_segura = html.escape(str(noticia['institucion']))
-            
-            # Logica inteligente de enlaces
-            link_web = noticia.get('url')
-            link_pdf = noticia.get('pdf')
-
-            texto_enlaces = ""
-            # Caso A: Ambos enlaces disponibles (prioridad a web)
-            if link_web and link_pdf:
-                texto_enlaces = f"🔗 {link_web}"
-            # Caso B: Solo Web
-            elif link_web:
-                texto_enlaces = f"🔗 {link_web}"
-            # Caso C: Solo PDF
-            elif link_pdf:
-                texto_enlaces = f"📥 {link_pdf}"
-
-            bandera = obtener_bandera(noticia['pais'])
-            mensaje = (
-                f"{bandera} <b>NUEVA ALERTA - {noticia['pais']}</b>\n"
-                f"🏛 <b>Institución:</b> {institucion_segura}\n"
-                f"📅 <b>Fecha:</b> {noticia['fecha']}\n\n"
-                f"⚠️ <b>{resumen_seguro}</b>\n\n"
-                f"{texto_enlaces}"
+                    cola.avanzar([noticia], 'resumen', contenido)
+            return contenido
+
+        def notificar(noticia):
+            # El resumen queda en la cola antes del envío: un run posterior no lo vuelve a pedir
+            cola.avanzar([noticia], 'historial' if SILENT_MODE else 'envio')
+            notificar_alerta(noticia)
+
+        # 4. Procesar y enviar alertas: extracción → resumen → envío encadenados por colas
+        with metrics.span('etapa', etapa='procesamiento'):
+            novedades_con_resumen = procesar_novedades(
+                novedades,
+                extraer=extraer,
+                resumir=generar_resumen,
+                notificar=notificar,
+                resumir_lote=generar_resumenes_lote,
+                buscar_en_cache=resumen_en_cache,
+                limitador=limitador,
+                runner=runner,
+                limite=plazo.limite_etapa('procesamiento')
             )
-            enviar_telegram(mensaje)
-            
-            # [PAUSA] Esperar 20 segundos para evitar Rate Limit de Gemini
-            print("  ⏳ Esperando 20 segundos para no saturar la API...")
-            time.sleep(20)
-        
-        # 5. Actualizar el historial
-        # Convertir novedades con resumen a DataFrame
-        df_novedades_actualizado = pd.DataFrame(novedades_con_resumen)
-        
-        # Concatenamos y guardamos con el nuevo formato
-        if 'pais' not in df_historico.columns or 'resumen' not in df_historico.columns:
-            # Si el historial es viejo, agregar columna resumen a candidatos
-            if 'resumen' not in df_candidatos.columns:
-                df_candidatos['resumen'] = df_candidatos['titulo']
-            df_actualizado = df_candidatos.drop_duplicates(subset=['url'])
-        else:
-            df_actualizado = pd.concat([df_historico, df_novedades_actualizado]).drop_duplicates(subset=['url'])
-            
-        df_actualizado.to_csv(ARCHIVO_HISTORIAL, index=False)
-        print(f"Historial actualizado: {len(df_actualizado)} registros")
+        print(resumen_estadisticas())
+
+        # Esperar a que la cola de Telegram termine de enviar, dentro del presupuesto de la etapa
+        with metrics.span('etapa', etapa='envio'):
+            no_enviadas = EMISOR_TELEGRAM.vaciar(plazo.presupuesto('envio'))
+        print(f"Telegram: {EMISOR_TELEGRAM.enviados} mensajes enviados, {EMISOR_TELEGRAM.fallidos} fallidos")
+
+        # 5. Actualizar el historial: solo se insertan las novedades, en un único lote.
+        # Lo que no se procesó o no se pudo enviar sigue en la cola, en la etapa que alcanzó
+        procesadas = {id(alerta) for alerta in novedades_con_resumen}
+        sin_enviar = {id(alerta) for alerta in no_enviadas}
+        sin_procesar = [alerta for alerta in novedades if id(alerta) not in procesadas]
+        novedades_con_resumen = [alerta for alerta in novedades_con_resumen if id(alerta) not in sin_enviar]
+
+        with metrics.span('etapa', etapa='historial'):
+            historial.guardar(novedades_con_resumen)
+            cola.diferir(sin_procesar, 'procesamiento')
+            cola.diferir(no_enviadas, 'envio')
+        print(f"Historial actualizado: {len(historial)} registros")
+        if sin_procesar or no_enviadas:
+            metrics.contar('diferidas', len(sin_procesar), etapa='procesamiento')
+            metrics.contar('diferidas', len(no_enviadas), etapa='envio')
+            print(f"[!] Pendientes: {len(sin_procesar)} alertas sin procesar (fuera de plazo) y {len(no_enviadas)} "
+                  f"sin enviar (fuera de plazo o envío fallido) quedan en la cola para el próximo run")
     else:
         print("No se encontraron novedades")
 
+    # Los validadores se confirman recién con el historial ya guardado
+    cache_http.guardar()
+    return novedades_con_resumen
+
+def ejecutar_daemon(duracion_maxima=None):
+    """
+    Modo daemon: un solo proceso de larga vida que consulta cada fuente según su propio intervalo.
+
+    Las importaciones, la sesión HTTP async, el cliente de Gemini, la cuota del limitador y el
+    pool de parseo se mantienen entre ciclos; solo se ejecutan los scrapers cuya consulta venció.
+    Los huecos largos entre ciclos se aprovechan para re-resumir alertas del historial (backfill.py).
+
+    Args:
+        duracion_maxima: Segundos tras los cuales el daemon termina (None = sin límite)
+    """
+    with abrir_historial() as historial:
+        publicaciones = historial.publicaciones_por_pais(VENTANA_HISTORIAL_DIAS)
+    planificador = Planificador(LISTA_DE_SCRAPERS, PAIS_POR_SCRAPER, publicaciones)
+    limitador = LimitadorGemini()
+    metrics.iniciar_endpoint_prometheus()
+    inicio = time.time()
+
+    def calcular_espera():
+        """Segundos hasta la próxima consulta programada, sin pasar del fin del daemon"""
+        espera = planificador.espera()
+        if duracion_maxima is not None:
+            espera = min(espera, max(0.0, duracion_maxima - (time.time() - inicio)))
+        return espera
+
+    with asyncio.Runner() as runner:
+        engine = runner.run(AsyncEngine().__aenter__())
+        try:
+            while duracion_maxima is None or time.time() - inicio < duracion_maxima:
+                vencidos = planificador.vencidas()
+                if vencidos:
+                    print(f"\n[daemon] Ciclo con {len(vencidos)} fuentes: {', '.join(s.__name__ for s in vencidos)}")
+                    try:
+                        novedades = ejecutar_flujo(vencidos, runner=runner, engine=engine, limitador=limitador)
+                    except Exception as e:
+                        print(f"[!] Error en el ciclo del daemon: {e}")
+                        novedades = []
+                    planificador.registrar(vencidos, Counter(n.pais for n in novedades))
+
+                espera = calcular_espera()
+                # Backfill solo en huecos largos y sin pisar el próximo ciclo
+                if espera >= backfill.VENTANA_MINIMA_SEGUNDOS:
+                    try:
+                        backfill.ejecutar_backfill(espera - backfill.MARGEN_SEGUNDOS, limitador=limitador, runner=runner)
+                    except Exception as e:
+                        print(f"[!] Error en el backfill: {e}")
+                    espera = calcular_espera()
+                time.sleep(espera)
+        except KeyboardInterrupt:
+            print("\n[daemon] Detenido")
+        finally:
+            runner.run(engine.__aexit__(None, None, None))
+
 if __name__ == "__main__":
-    ejecutar_flujo()
+    parser = argparse.ArgumentParser(description="Scraper de alertas sanitarias")
+    parser.add_argument('--daemon', action='store_true', help="Proceso de larga vida con intervalos por fuente")
+    parser.add_argument('--duracion', type=float, default=None, help="Minutos tras los cuales termina el daemon")
+    args = parser.parse_args()
+
+    # Un solo proceso a la vez sobre el historial y los caches (cron superpuesto, daemon activo)
+    with BloqueoRun() as bloqueo:
+        if not bloqueo.adquirir():
+            print("[!] Otra ejecución sigue en curso, se omite este run")
+            sys.exit(0)
+
+        if args.daemon:
+            ejecutar_daemon(args.duracion * 60 if args.duracion else None)
+        else:
+            ejecutar_flujo()
@@ -0,0 +1,180 @@
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from data_dir import DIR_DATOS
+
+# Reporte JSON-lines de cada run (un span o un bloque de contadores por línea, se agrega al final)
+ARCHIVO_REPORTE = os.environ.get('METRICAS_REPORTE', os.path.join(DIR_DATOS, 'metricas_run.jsonl'))
+
+# Puerto del endpoint de texto Prometheus (/metrics); sin definir no se levanta
+PUERTO_PROMETHEUS = os.environ.get('METRICAS_PUERTO')
+PREFIJO_PROMETHEUS = 'alertas'
+
+# Span activo del contexto actual: las tareas asyncio y asyncio.to_thread heredan el contexto
+_span_actual = contextvars.ContextVar('span_actual', default=None)
+_ids = itertools.count(1)
+
+class Span:
+    """
+    Tramo de trabajo medido. Las etiquetas son de baja cardinalidad (fuente, host, país, status) y
+    agrupan los agregados de Prometheus; los datos (url, bytes, caracteres) solo van al reporte.
+    """
+    __slots__ = ('id', 'padre', 'nombre', 'etiquetas', 'datos', 'inicio', 'duracion', 'error')
+
+    def __init__(self, nombre, padre, etiquetas):
+        self.id = next(_ids)
+        self.padre = padre
+        self.nombre = nombre
+        self.etiquetas = etiquetas
+        self.datos = {}
+        self.inicio = time.time()
+        self.duracion = None
+        self.error = None
+
+    def a_dict(self):
+        return {
+            'tipo': 'span', 'id': self.id, 'padre': self.padre, 'nombre': self.nombre,
+            'inicio': round(self.inicio, 3), 'duracion': round(self.duracion, 4),
+            'etiquetas': self.etiquetas, 'datos': self.datos, 'error': self.error
+        }
+
+def _etiquetas_prometheus(etiquetas):
+    if not etiquetas:
+        return ''
+    pares = []
+    for clave, valor in etiquetas:
+        valor = valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{clave}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+class Metricas:
+    """
+    Spans y contadores del proceso.
+
+    Los spans terminados se acumulan hasta volcarlos al reporte del run; los agregados (cantidad y
+    suma de segundos por span, contadores) persisten en el proceso para el endpoint Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+        self._contadores = {}
+        self._duraciones = {}
+
+    @contextlib.contextmanager
+    def span(self, nombre, **etiquetas):
+        padre = _span_actual.get()
+        span = Span(nombre, padre.id if padre else None, etiquetas)
+        token = _span_actual.set(span)
+        inicio = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{e.__class__.__name__}: {e}"[:200]
+            raise
+        finally:
+            span.duracion = time.perf_counter() - inicio
+            _span_actual.reset(token)
+            self._registrar(span)
+
+    def _registrar(self, span):
+        clave = (span.nombre, tuple(sorted((k, str(v)) for k, v in span.etiquetas.items())))
+        with self._lock:
+            self._spans.append(span)
+            cantidad, suma = self._duraciones.get(clave, (0, 0.0))
+            self._duraciones[clave] = (cantidad + 1, suma + span.duracion)
+
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        clave = (nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def volcar(self, ruta=ARCHIVO_REPORTE):
+        """
+        Agrega al reporte los spans terminados desde el último volcado y los contadores acumulados
+
+        Returns:
+            int: Cantidad de spans escritos
+        """
+        with self._lock:
+            spans, self._spans = self._spans, []
+            contadores = [{'nombre': nombre, 'etiquetas': dict(etiquetas), 'valor': valor}
+                          for (nombre, etiquetas), valor in self._contadores.items()]
+        try:
+            with open(ruta, 'a', encoding='utf-8') as f:
+                for span in spans:
+                    f.write(json.dumps(span.a_dict(), ensure_ascii=False) + '\n')
+                f.write(json.dumps({'tipo': 'contadores', 'fin': round(time.time(), 3), 'contadores': contadores},
+                                   ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"[!] No se pudo escribir el reporte de métricas: {e}")
+        return len(spans)
+
+    def mas_lentos(self, nombre, cantidad=5):
+        """Spans pendientes de volcar con ese nombre, del más lento al más rápido"""
+        with self._lock:
+            candidatos = [span for span in self._spans if span.nombre == nombre]
+        return sorted(candidatos, key=lambda span: span.duracion, reverse=True)[:cantidad]
+
+    def texto_prometheus(self):
+        """Agregados en el formato de texto de Prometheus"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            duraciones = dict(self._duraciones)
+
+        lineas = []
+        for nombre in sorted({nombre for nombre, _ in contadores}):
+            metrica = f"{PREFIJO_PROMETHEUS}_{nombre}_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            for (n, etiquetas), valor in contadores.items():
+                if n == nombre:
+                    lineas.append(f"{metrica}{_etiquetas_prometheus(etiquetas)} {valor}")
+        for nombre in sorted({nombre for nombre, _ in duraciones}):
+            metrica = f"{PREFIJO_PROMETHEUS}_{nombre}_segundos"
+            lineas.append(f"# TYPE {metrica} summary")
+            for (n, etiquetas), (cantidad, suma) in duraciones.items():
+                if n == nombre:
+                    lineas.append(f"{metrica}_count{_etiquetas_prometheus(etiquetas)} {cantidad}")
+                    lineas.append(f"{metrica}_sum{_etiquetas_prometheus(etiquetas)} {suma:.6f}")
+        return '\n'.join(lineas) + '\n'
+
+METRICAS = Metricas()
+
+def span(nombre, **etiquetas):
+    return METRICAS.span(nombre, **etiquetas)
+
+def contar(nombre, cantidad=1, **etiquetas):
+    METRICAS.contar(nombre, cantidad, **etiquetas)
+
+def iniciar_endpoint_prometheus(puerto=PUERTO_PROMETHEUS):
+    """Sirve /metrics en un hilo propio si hay puerto configurado (pensado para el modo daemon)"""
+    if not puerto:
+        return None
+
+    # http.server solo se importa si el endpoint está habilitado (costo de arranque)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ManejadorPrometheus(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = METRICAS.texto_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('0.0.0.0', int(puerto)), ManejadorPrometheus)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(f"Métricas Prometheus en http://0.0.0.0:{puerto}/metrics")
+    return servidor
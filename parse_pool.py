@@ -0,0 +1,60 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Procesos dedicados al parseo de HTML y PDF (0 = parsear en el mismo proceso, sin pool)
+WORKERS_PARSEO = int(os.environ.get('WORKERS_PARSEO', 0))
+
+_pool = None
+_lock_pool = threading.Lock()
+
+def obtener_pool():
+    """
+    Pool de procesos compartido, creado con el primer uso.
+
+    BeautifulSoup y PyMuPDF consumen CPU y en hilos se serializan por el GIL: en procesos aparte
+    el parseo escala con los núcleos. Se usa 'spawn' porque el proceso principal ya tiene hilos
+    (event loop, sesiones HTTP) y hacer fork en ese estado no es seguro.
+    """
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS_PARSEO,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            atexit.register(cerrar)
+    return _pool
+
+def ejecutar(funcion, *args):
+    """
+    Ejecuta una función de parseo (de nivel de módulo, con argumentos serializables)
+
+    Args:
+        funcion: Función pura bytes -> registros compactos (dicts, tuplas, str)
+        *args: Contenido crudo descargado y parámetros del parseo
+
+    Returns:
+        El resultado de la función, calculado en un proceso del pool si WORKERS_PARSEO > 0
+    """
+    if WORKERS_PARSEO <= 0:
+        return funcion(*args)
+    return obtener_pool().submit(funcion, *args).result()
+
+async def ejecutar_async(funcion, *args):
+    """Versión para corrutinas: espera al pool sin bloquear el event loop"""
+    if WORKERS_PARSEO <= 0:
+        return funcion(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(obtener_pool(), partial(funcion, *args))
+
+def cerrar():
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
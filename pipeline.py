@@ -0,0 +1,266 @@
+import asyncio
+import os
+import random
+import time
+import metrics
+
+# Cuota de Gemini (configurable según el plan de la API key)
+GEMINI_RPM = int(os.environ.get('GEMINI_RPM', 5))
+GEMINI_TPM = int(os.environ.get('GEMINI_TPM', 250000))
+
+MAX_EXTRACCIONES_CONCURRENTES = 8
+MAX_RESUMENES_CONCURRENTES = 2
+TAMANO_LOTE_RESUMEN = int(os.environ.get('GEMINI_TAMANO_LOTE', 5))
+ESPERA_LOTE_SEGUNDOS = 0.5  # Cuánto se espera a que lleguen más textos antes de cerrar un lote
+
+# Tokens fijos por request además del texto: system instruction + respuesta
+TOKENS_FIJOS_POR_RESUMEN = 200
+
+# Reintentos ante errores transitorios de Gemini (rate limit, sobrecarga, cortes de red)
+MAX_REINTENTOS_RESUMEN = 3
+ESPERA_BASE_SEGUNDOS = 2
+ESPERA_MAXIMA_SEGUNDOS = 60
+
+class ReintentarResumen(Exception):
+    """
+    Lo lanzan resumir / resumir_lote ante un error transitorio: el pipeline reintenta el llamado
+    pasando otra vez por el limitador y solo si la espera entra antes del límite de la etapa
+    """
+
+    def __init__(self, mensaje, espera=None):
+        super().__init__(mensaje)
+        self.espera = espera  # Segundos que sugiere el servidor, o None
+
+def espera_reintento(intento, sugerida=None):
+    """Backoff exponencial con jitter; respeta la espera sugerida por el servidor (con tope)"""
+    espera = ESPERA_BASE_SEGUNDOS * 2 ** intento * random.uniform(0.5, 1.0)
+    if sugerida:
+        espera = max(espera, sugerida)
+    return min(espera, ESPERA_MAXIMA_SEGUNDOS)
+
+class TokenBucket:
+    """
+    Limitador token-bucket asíncrono: el balde se llena a razón de `por_minuto` / 60 por segundo
+    hasta un máximo de `por_minuto`, y cada adquisición espera hasta que haya saldo suficiente.
+    """
+
+    def __init__(self, por_minuto):
+        self.capacidad = por_minuto
+        self.tasa = por_minuto / 60
+        self.tokens = por_minuto
+        self.ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    async def adquirir(self, cantidad=1):
+        cantidad = min(cantidad, self.capacidad)
+        async with self._lock:
+            self._recargar()
+            while self.tokens < cantidad:
+                await asyncio.sleep((cantidad - self.tokens) / self.tasa)
+                self._recargar()
+            self.tokens -= cantidad
+
+class LimitadorGemini:
+    """Respeta a la vez la cuota de requests por minuto (RPM) y de tokens por minuto (TPM)"""
+
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def adquirir(self, tokens_estimados):
+        await self.requests.adquirir(1)
+        await self.tokens.adquirir(tokens_estimados)
+
+def estimar_tokens(texto):
+    """Estimación conservadora: ~4 caracteres por token más el costo fijo de cada request"""
+    return len(texto) // 4 + TOKENS_FIJOS_POR_RESUMEN
+
+def _restante(limite):
+    """Segundos hasta el límite (time.monotonic) o None si no hay límite"""
+    return None if limite is None else limite - time.monotonic()
+
+async def _procesar_novedades(novedades, extraer, resumir, notificar, limitador, resumir_lote, buscar_en_cache, limite):
+    cola_resumen = asyncio.Queue()
+    cola_envio = asyncio.Queue()
+    procesadas = []
+    semaforo_extraccion = asyncio.Semaphore(MAX_EXTRACCIONES_CONCURRENTES)
+
+    def fuera_de_plazo():
+        restante = _restante(limite)
+        return restante is not None and restante <= 0
+
+    # Etapa 1: extracción de contenido de todas las novedades en paralelo
+    async def extraer_novedad(noticia):
+        if noticia.resumen:
+            # Pendiente de un run anterior que ya tiene resumen: solo falta enviarla
+            await registrar(noticia, noticia.resumen)
+            return
+
+        async with semaforo_extraccion:
+            # Lo que no empieza antes del límite queda sin procesar (el llamador lo difiere)
+            if fuera_de_plazo():
+                return
+            print(f"\nProcesando alerta para {noticia.pais} - {noticia.titulo[:50]}...")
+            try:
+                contenido = await asyncio.to_thread(extraer, noticia)
+            except Exception as e:
+                print(f"  ! Error en extracción: {e}")
+                contenido = None
+        await cola_resumen.put((noticia, contenido))
+
+    async def llamar_gemini(funcion, tokens_estimados, *args):
+        """
+        Llama a resumir / resumir_lote en un hilo; cada intento consume cuota del limitador.
+
+        Raises:
+            asyncio.TimeoutError: Sin cuota o sin tiempo para otro intento antes del límite
+            ReintentarResumen: Si se agotaron los reintentos
+        """
+        for intento in range(MAX_REINTENTOS_RESUMEN + 1):
+            await asyncio.wait_for(limitador.adquirir(tokens_estimados), _restante(limite))
+            try:
+                return await asyncio.to_thread(funcion, *args)
+            except ReintentarResumen as e:
+                if intento == MAX_REINTENTOS_RESUMEN:
+                    raise
+                espera = espera_reintento(intento, e.espera)
+                restante = _restante(limite)
+                if restante is not None and espera >= restante:
+                    raise asyncio.TimeoutError from e
+                metrics.contar('gemini_reintentos')
+                print(f"  ⏳ {e}, reintentando en {espera:.1f}s...")
+                await asyncio.sleep(espera)
+
+    async def registrar(noticia, resumen):
+        noticia.resumen = resumen
+        procesadas.append(noticia)
+        await cola_envio.put(noticia)
+
+    async def resumir_individual(noticia, contenido):
+        resumen = noticia.titulo  # Fallback por defecto
+        try:
+            resumen = await llamar_gemini(resumir, estimar_tokens(contenido), contenido, noticia.titulo)
+        except asyncio.TimeoutError:
+            return  # Sin cuota o sin tiempo para reintentar antes del límite: queda sin procesar
+        except Exception as e:
+            print(f"  ! Error en resumen: {e}")
+            metrics.contar('resumen_fallback', motivo='error')
+        await registrar(noticia, resumen)
+
+    async def resumir_en_lote(lote):
+        textos = [contenido for _, contenido in lote]
+        resumenes = [None] * len(lote)
+        try:
+            # Un solo request para todo el lote, con los tokens de todos los textos
+            resumenes = await llamar_gemini(resumir_lote, sum(estimar_tokens(texto) for texto in textos), textos)
+        except asyncio.TimeoutError:
+            return  # Sin cuota o sin tiempo para reintentar antes del límite: el lote queda sin procesar
+        except Exception as e:
+            print(f"  ! Error en resumen por lote: {e}")
+
+        for (noticia, contenido), resumen in zip(lote, resumenes):
+            if resumen:
+                await registrar(noticia, resumen)
+            else:
+                # Solo lo que el lote no cubrió se resume por separado
+                await resumir_individual(noticia, contenido)
+
+    # Etapa 2: resúmenes regulados por el limitador de cuota de Gemini
+    async def resumir_novedades():
+        while True:
+            item = await cola_resumen.get()
+            if item is None:
+                break
+
+            # Se suman al lote las novedades que terminan de extraerse en los próximos instantes
+            pendientes = [item]
+            while len(pendientes) < TAMANO_LOTE_RESUMEN:
+                try:
+                    siguiente = await asyncio.wait_for(cola_resumen.get(), timeout=ESPERA_LOTE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    break
+                if siguiente is None:
+                    await cola_resumen.put(None)  # La señal de fin queda para la próxima vuelta
+                    break
+                pendientes.append(siguiente)
+
+            if fuera_de_plazo():
+                continue  # La cola se sigue vaciando sin resumir: estas novedades quedan sin procesar
+
+            lote = []
+            for noticia, contenido in pendientes:
+                if contenido:
+                    print(f"  ✓ Contenido extraído: {len(contenido)} caracteres")
+                    # Un acierto de cache no consume cuota ni pasa por el limitador
+                    cacheado = buscar_en_cache(contenido) if buscar_en_cache else None
+                    if cacheado:
+                        print(f"  ✓ Resumen desde cache: {cacheado[:50]}...")
+                        await registrar(noticia, cacheado)
+                    else:
+                        lote.append((noticia, contenido))
+                else:
+                    print(f"  ! No se pudo extraer contenido, usando título original")
+                    metrics.contar('resumen_fallback', motivo='sin_contenido')
+                    await registrar(noticia, noticia.titulo)
+
+            if len(lote) == 1 or (lote and resumir_lote is None):
+                for noticia, contenido in lote:
+                    await resumir_individual(noticia, contenido)
+            elif lote:
+                await resumir_en_lote(lote)
+
+    # Etapa 3: envíos a Telegram desde su propia cola
+    async def enviar_novedades():
+        while True:
+            noticia = await cola_envio.get()
+            if noticia is None:
+                break
+            try:
+                await asyncio.to_thread(notificar, noticia)
+            except Exception as e:
+                print(f"  ! Error enviando alerta: {e}")
+
+    resumidores = [asyncio.create_task(resumir_novedades()) for _ in range(MAX_RESUMENES_CONCURRENTES)]
+    emisor = asyncio.create_task(enviar_novedades())
+
+    await asyncio.gather(*(extraer_novedad(noticia) for noticia in novedades))
+    for _ in resumidores:
+        await cola_resumen.put(None)
+    await asyncio.gather(*resumidores)
+
+    await cola_envio.put(None)
+    await emisor
+
+    return procesadas
+
+def procesar_novedades(novedades, extraer, resumir, notificar, limitador=None, resumir_lote=None, buscar_en_cache=None, runner=None,
+                       limite=None):
+    """
+    Procesa las novedades en tres etapas encadenadas por colas: extracción → resumen → envío
+
+    Args:
+        novedades: Lista de Alerta nuevas
+        extraer: Función alerta -> texto o None
+        resumir: Función (texto, titulo) -> resumen; puede lanzar ReintentarResumen
+        notificar: Función alerta (con .resumen asignado) -> None
+        limitador: LimitadorGemini, por defecto uno con la cuota de GEMINI_RPM / GEMINI_TPM
+        resumir_lote: Función opcional [textos] -> [resumen o None] para resumir varios en una llamada;
+            puede lanzar ReintentarResumen
+        buscar_en_cache: Función opcional texto -> resumen ya generado o None
+        runner: asyncio.Runner opcional; con un limitador compartido entre llamadas debe ser
+            siempre el mismo, porque sus locks quedan ligados al event loop
+        limite: Instante (time.monotonic) tras el cual no se empiezan extracciones ni resúmenes;
+            las alertas que ya tienen .resumen pasan directo al envío
+
+    Returns:
+        list: Alerta con su .resumen asignado (título como fallback); las que no entraron en
+            el límite no se devuelven
+    """
+    limitador = limitador or LimitadorGemini()
+    ejecutar = runner.run if runner else asyncio.run
+    return ejecutar(_procesar_novedades(novedades, extraer, resumir, notificar, limitador, resumir_lote, buscar_en_cache, limite))
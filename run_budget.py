@@ -0,0 +1,99 @@
+import os
+import time
+from data_dir import DIR_DATOS
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+ARCHIVO_BLOQUEO = os.path.join(DIR_DATOS, '.ejecucion.lock')
+
+# Plazo total de un run: el cron dispara cada 15 minutos y el job también instala dependencias
+PLAZO_RUN_SEGUNDOS = float(os.environ.get('PLAZO_RUN_SEGUNDOS', 11 * 60))
+
+# Reparto del plazo entre etapas, en orden. Cada etapa recibe su fracción del tiempo que queda,
+# así lo que una etapa no usa pasa a las siguientes
+FRACCION_ETAPAS = {
+    'scraping': 0.30,
+    'procesamiento': 0.50,
+    'envio': 0.20
+}
+
+# Tiempo que se reserva al final para guardar historial, caches y métricas
+RESERVA_CIERRE_SEGUNDOS = 20
+
+class PlazoRun:
+    """
+    Plazo de un run y presupuesto de tiempo de cada etapa.
+
+    El presupuesto se calcula al empezar la etapa, repartiendo el tiempo restante (menos la
+    reserva de cierre) en proporción a las fracciones de esa etapa y las siguientes.
+    """
+
+    def __init__(self, segundos=PLAZO_RUN_SEGUNDOS):
+        self.segundos = segundos
+        self.inicio = time.monotonic()
+        self.limite = self.inicio + segundos
+
+    def restante(self):
+        return max(0.0, self.limite - time.monotonic())
+
+    def vencido(self):
+        return time.monotonic() >= self.limite
+
+    def presupuesto(self, etapa):
+        """
+        Returns:
+            float: Segundos disponibles para la etapa (0 si el run ya no tiene margen)
+        """
+        etapas = list(FRACCION_ETAPAS)
+        pendientes = etapas[etapas.index(etapa):]
+        fraccion = FRACCION_ETAPAS[etapa] / sum(FRACCION_ETAPAS[e] for e in pendientes)
+        return max(0.0, self.restante() - RESERVA_CIERRE_SEGUNDOS) * fraccion
+
+    def limite_etapa(self, etapa):
+        """Instante (time.monotonic) en que vence el presupuesto de la etapa"""
+        return time.monotonic() + self.presupuesto(etapa)
+
+class BloqueoRun:
+    """
+    Bloqueo exclusivo del directorio de datos: evita que dos runs (o un run y el daemon) escriban
+    el historial y los caches a la vez. Lo libera el sistema aunque el proceso muera.
+    """
+
+    def __init__(self, ruta=ARCHIVO_BLOQUEO):
+        self.ruta = ruta
+        self._archivo = None
+
+    def adquirir(self):
+        """
+        Returns:
+            bool: False si otro proceso ya tiene el bloqueo
+        """
+        if fcntl is None:
+            return True
+        self._archivo = open(self.ruta, 'a+')
+        try:
+            fcntl.flock(self._archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._archivo.close()
+            self._archivo = None
+            return False
+        self._archivo.seek(0)
+        self._archivo.truncate()
+        self._archivo.write(f"{os.getpid()}\n")
+        self._archivo.flush()
+        return True
+
+    def liberar(self):
+        if self._archivo is not None:
+            fcntl.flock(self._archivo, fcntl.LOCK_UN)
+            self._archivo.close()
+            self._archivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.liberar()
@@ -0,0 +1,108 @@
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Límites del intervalo de consulta de cada fuente
+INTERVALO_MINIMO_SEGUNDOS = 5 * 60
+INTERVALO_MAXIMO_SEGUNDOS = 4 * 3600
+
+# El intervalo inicial es una fracción del tiempo medio entre publicaciones observado en el historial
+VENTANA_HISTORIAL_DIAS = 90
+FRACCION_ENTRE_PUBLICACIONES = 1 / 24
+
+# Ajuste tras cada consulta: se acelera al encontrar novedades y se relaja si no hay
+FACTOR_CON_NOVEDADES = 0.5
+FACTOR_SIN_NOVEDADES = 1.5
+
+# Fuera del horario laboral local de la fuente las consultas se espacian más
+HORARIO_LABORAL = range(8, 20)
+FACTOR_FUERA_DE_HORARIO = 4
+
+ZONAS_HORARIAS = {
+    'Perú': 'America/Lima',
+    'Chile': 'America/Santiago',
+    'Brasil': 'America/Sao_Paulo',
+    'Colombia': 'America/Bogota',
+    'México': 'America/Mexico_City',
+    'Argentina': 'America/Argentina/Buenos_Aires',
+    'Bolivia': 'America/La_Paz',
+    'Costa Rica': 'America/Costa_Rica'
+}
+
+def intervalo_inicial(publicaciones, ventana_dias=VENTANA_HISTORIAL_DIAS):
+    """Intervalo de consulta según la cantidad de alertas publicadas en la ventana"""
+    if not publicaciones:
+        return INTERVALO_MAXIMO_SEGUNDOS
+    entre_publicaciones = ventana_dias * 86400 / publicaciones
+    intervalo = entre_publicaciones * FRACCION_ENTRE_PUBLICACIONES
+    return min(INTERVALO_MAXIMO_SEGUNDOS, max(INTERVALO_MINIMO_SEGUNDOS, intervalo))
+
+class FuenteProgramada:
+    """Estado de programación de un scraper: intervalo base adaptativo y próxima consulta"""
+
+    def __init__(self, scraper, pais, publicaciones=0):
+        self.scraper = scraper
+        self.pais = pais
+        self.intervalo_base = intervalo_inicial(publicaciones)
+        self.proxima = 0.0  # Todas las fuentes se consultan en el primer ciclo
+        try:
+            self.zona = ZoneInfo(ZONAS_HORARIAS[pais])
+        except (KeyError, ZoneInfoNotFoundError):
+            self.zona = None
+
+    def en_horario(self, ahora):
+        if self.zona is None:
+            return True
+        local = datetime.fromtimestamp(ahora, self.zona)
+        return local.weekday() < 5 and local.hour in HORARIO_LABORAL
+
+    def intervalo(self, ahora):
+        intervalo = self.intervalo_base
+        if not self.en_horario(ahora):
+            intervalo *= FACTOR_FUERA_DE_HORARIO
+        return min(INTERVALO_MAXIMO_SEGUNDOS, intervalo)
+
+    def registrar(self, novedades, ahora):
+        factor = FACTOR_CON_NOVEDADES if novedades else FACTOR_SIN_NOVEDADES
+        self.intervalo_base = min(INTERVALO_MAXIMO_SEGUNDOS, max(INTERVALO_MINIMO_SEGUNDOS, self.intervalo_base * factor))
+        self.proxima = ahora + self.intervalo(ahora)
+
+class Planificador:
+    """
+    Programa cada scraper con su propio intervalo para el modo daemon.
+
+    El punto de partida es la tasa de publicación de cada país en el historial (AGEMED publica
+    poco, ISPCH seguido); luego cada consulta lo ajusta: con novedades el intervalo se reduce a la
+    mitad y sin novedades crece, siempre dentro de [INTERVALO_MINIMO, INTERVALO_MAXIMO].
+    """
+
+    def __init__(self, scrapers, pais_por_scraper, publicaciones_por_pais=None):
+        publicaciones_por_pais = publicaciones_por_pais or {}
+        self.fuentes = []
+        for scraper in scrapers:
+            pais = pais_por_scraper.get(scraper.__name__)
+            self.fuentes.append(FuenteProgramada(scraper, pais, publicaciones_por_pais.get(pais, 0)))
+
+    def vencidas(self, ahora=None):
+        """Scrapers cuya próxima consulta ya llegó"""
+        ahora = time.time() if ahora is None else ahora
+        return [fuente.scraper for fuente in self.fuentes if fuente.proxima <= ahora]
+
+    def registrar(self, scrapers, novedades_por_pais, ahora=None):
+        """
+        Reprograma los scrapers recién ejecutados
+
+        Args:
+            scrapers: Scrapers ejecutados en el ciclo
+            novedades_por_pais: Dict pais -> cantidad de novedades encontradas
+        """
+        ahora = time.time() if ahora is None else ahora
+        for fuente in self.fuentes:
+            if fuente.scraper in scrapers:
+                fuente.registrar(novedades_por_pais.get(fuente.pais, 0), ahora)
+                print(f"  -> {fuente.scraper.__name__}: próxima consulta en {fuente.intervalo(ahora) / 60:.0f} min")
+
+    def espera(self, ahora=None):
+        """Segundos hasta la próxima consulta programada"""
+        ahora = time.time() if ahora is None else ahora
+        return max(0.0, min(fuente.proxima for fuente in self.fuentes) - ahora)
@@ -1,96 +1,162 @@
+import asyncio
 import feedparser
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import time
 from datetime import datetime
 import re
-from curl_cffi import requests
 from urllib.parse import urljoin
+from alerts import Alerta
+import metrics
+
+# Parser de HTML: lxml (libxml2, en C) es varias veces más rápido que html.parser
+PARSER_HTML = 'lxml'
+
+# Cantidad de alertas ya conocidas seguidas tras la cual se deja de recorrer un listado
+MAX_CONOCIDAS_SEGUIDAS = 5
+
+class CorteConocidas:
+    '''
+    Lleva la cuenta de URLs ya presentes en el historial dentro de un listado ordenado
+    del más reciente al más antiguo: cuando aparecen varias seguidas, lo que sigue también es viejo.
+    '''
+
+    def __init__(self, urls_conocidas, limite=MAX_CONOCIDAS_SEGUIDAS):
+        self.urls_conocidas = urls_conocidas
+        self.limite = limite
+        self.seguidas = 0
+
+    def conocida(self, url):
+        if url in self.urls_conocidas:
+            self.seguidas += 1
+            return True
+        self.seguidas = 0
+        return False
+
+    @property
+    def agotado(self):
+        return self.seguidas >= self.limite
+
+def filtrar_conocidas(noticias, urls_conocidas, ordenadas=True):
+    '''
+    Descarta las noticias ya presentes en el historial.
+    En listados ordenados por fecha deja de recorrer tras MAX_CONOCIDAS_SEGUIDAS conocidas seguidas.
+    '''
+    corte = CorteConocidas(urls_conocidas)
+    nuevas = []
+    for noticia in noticias:
+        if corte.conocida(noticia.url):
+            if ordenadas and corte.agotado:
+                break
+            continue
+        nuevas.append(noticia)
+    metrics.contar('alertas_descartadas', len(noticias) - len(nuevas))
+    return nuevas
+
+# Las funciones parsear_* reciben el contenido crudo y devuelven registros Alerta:
+# corren en el pool de procesos (parse_pool) cuando está habilitado.
+
+def parsear_feed(contenido, pais, institucion):
+    ''' Entradas de un feed RSS como alertas con url, titulo y fecha normalizada '''
+    entradas = []
+    feed = feedparser.parse(contenido)
+    for entry in feed.entries:
+        fecha_str = "Sin Fecha"
+        if hasattr(entry, 'published_parsed') and entry.published_parsed:
+            fecha_struct = entry.published_parsed
+            fecha_str = time.strftime("%d-%m-%Y %H:%M:%S", fecha_struct)
+        entradas.append(Alerta(
+            url=entry.link,
+            titulo=entry.title,
+            fecha=fecha_str,
+            pais=pais,
+            institucion=institucion
+        ))
+    return entradas
 
 '''
 fuentes: https://bvcenadim.digemid.minsa.gob.pe/index.php/enlaces/agencias-reguladoras-en-el-mundo
 '''
 ##### PERÚ :)
-def detalle_alerta_peru(url_noticia):
+def parsear_detalle_peru(contenido, url_noticia):
+    ''' Devuelve siempre la tupla (motivo, link_pdf, producto); los datos ausentes quedan en None '''
+    soup = BeautifulSoup(contenido, PARSER_HTML)
+
+    # Extraer Motivo
+    tag_motivo = soup.select_one("div.entry-content h3")
+    motivo = tag_motivo.get_text(strip=True) if tag_motivo else "Sin detalle en H3"
+
+    # Extraer producto afectado
+    tag_producto = soup.select_one("div.entry-content ul")
+    producto = tag_producto.get_text(strip=True) if tag_producto else None
+
+    # Extraer PDF
+    tag_pdf = soup.select_one('[href$=".pdf"], [src$=".pdf"]')
+    link_pdf = None
+
+    if tag_pdf:
+        # Determina si el atributo es href o src
+        attr = "href" if tag_pdf.has_attr("href") else "src"
+        link_pdf = urljoin(url_noticia, tag_pdf[attr])
+    else:
+        print("No se encontró enlace PDF")
+
+    return motivo, link_pdf, producto
+
+async def detalle_alerta_peru(engine, url_noticia):
     try:
-        response = requests.get(
-            url_noticia, 
-            impersonate="chrome110", 
-            timeout=10, 
-            verify=False
-        )
-        
+        response = await engine.get(url_noticia, tipo='detalle')
+
         if response.status_code != 200:
-            return {"motivo": "Error de acceso", "pdf": None}
-
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Extraer Motivo 
-        tag_motivo = soup.select_one("div.entry-content h3")
-        motivo = tag_motivo.get_text(strip=True) if tag_motivo else "Sin detalle en H3"
-
-        # Extraer producto afectado
-        tag_producto = soup.select_one("div.entry-content ul")
-        producto = tag_producto.get_text(strip=True) if tag_producto else None
-        
-        # Extraer PDF
-        tag_pdf = soup.select_one('[href$=".pdf"], [src$=".pdf"]')
-        
-        if tag_pdf:
-            # Determina si el atributo es href o src
-            attr = "href" if tag_pdf.has_attr("href") else "src"
-            link_pdf = urljoin(url_noticia, tag_pdf[attr])
-        else:
-            print("No se encontró enlace PDF")
-            
-        return motivo, link_pdf, producto
+            print(f"[!] Error {response.status_code} accediendo al detalle {url_noticia}")
+            return None, None, None
+
+        return await engine.parsear(parsear_detalle_peru, response.content, url_noticia)
 
     except Exception as e:
         print(f"[!] Error scrapeando detalle {url_noticia}: {e}")
-        return {"motivo": "Error", "pdf": None}
+        return None, None, None
 
-def scrape_peru():
+async def scrape_peru(engine, urls_conocidas=frozenset()):
     url_peru = "https://www.digemid.minsa.gob.pe/webDigemid/publicaciones/alertas-modificaciones/feed/?paged="
     noticias_peru = []
-    for i in range(1,2):
-        url_pagina = url_peru + str(i)
-        try:
-            feed = feedparser.parse(url_pagina)
 
-            for entry in feed.entries:
-                titulo = entry.title
-                link = entry.link
+    async def procesar_entrada(entrada):
+        titulo = entrada.titulo
+
+        motivo, pdf, producto = await detalle_alerta_peru(engine, entrada.url)
+        if motivo and producto != None:
+            entrada.titulo = f"{titulo} - {motivo}. Productos: {producto}"
+        elif motivo:
+            entrada.titulo = f"{titulo} - {motivo}"
 
-                fecha_str = "Sin Fecha"
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    fecha_struct = entry.published_parsed
-                    fecha_str = time.strftime("%d-%m-%Y %H:%M:%S", fecha_struct)
+        entrada.pdf = pdf
 
-                motivo, pdf, producto = detalle_alerta_peru(link)
-                if motivo and producto != None:
-                    titulo_completo = f"{titulo} - {motivo}. Productos: {producto}"
-                elif motivo:
-                    titulo_completo = f"{titulo} - {motivo}"
+        return entrada
 
-                link_pdf = pdf
+    for i in range(1,2):
+        url_pagina = url_peru + str(i)
+        try:
+            response = await engine.get_condicional(url_pagina, tipo='feed')
+            if response is None:
+                continue
+            entradas = await engine.parsear(parsear_feed, response.content, 'Perú', 'DIGEMID', listado=url_pagina)
 
-                noticias_peru.append({
-                    'url': link,
-                    'pdf': link_pdf,
-                    'titulo': titulo_completo,
-                    'fecha': fecha_str,
-                    'pais': 'Perú',
-                    'institucion': 'DIGEMID'
-                })
+            # Solo se descarga el detalle de las entradas nuevas, en paralelo
+            entradas_nuevas = filtrar_conocidas(entradas, urls_conocidas)
 
-                time.sleep(0.5)
+            noticias_peru.extend(await asyncio.gather(
+                *(procesar_entrada(entrada) for entrada in entradas_nuevas)
+            ))
 
         except Exception as e:
             print(f"  -> [ERROR] Falló el scraping de DIGEMID: {e}")
-            return []
+            # La página se vuelve a parsear en el próximo run; las anteriores ya están completas
+            engine.descartar(url_pagina)
+            return noticias_peru
     return noticias_peru
 
 ##### CHILE :/
-def scrape_chile():
+async def scrape_chile(engine, urls_conocidas=frozenset()):
     ''' Extrae las ultimas alertas del Instituto de Salud Pública de Chile'''
     print("  -> Scrapeando CHILE - ISPCH...")
     url_chile = {
@@ -99,138 +165,207 @@ def scrape_chile():
         "Alerta Desinfectantes": "https://www.ispch.gob.cl/categorias-alertas/desinfectantes-y-sanitizantes/feed/"
     }
 
-    noticias_chile = []
-
-    for subcategoria, url in url_chile.items():
-        response = requests.get(
-            url,
-            timeout=30,
-            impersonate="chrome110",
-            verify=False
-        )
-        response.raise_for_status()
+    async def scrape_feed(subcategoria, url):
+        # Un feed caído no descarta los otros dos
+        try:
+            response = await engine.get_condicional(url, tipo='feed')
+        except Exception as e:
+            print(f"  -> [ERROR] No se pudo obtener CHILE - {subcategoria}: {e}")
+            return []
+        if response is None:
+            return []
+        if response.status_code != 200:
+            print(f"  -> [ERROR] CHILE - {subcategoria}: status {response.status_code}")
+            return []
 
         try:
-            feed = feedparser.parse(response.content)
-            for entry in feed.entries:
-                fecha_str = "Sin Fecha"
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    fecha_struct = entry.published_parsed
-                    fecha_str = time.strftime("%d-%m-%Y %H:%M:%S", fecha_struct)
-                noticias_chile.append({
-                    'url': entry.link,
-                    'titulo': entry.title,
-                    'fecha': fecha_str,
-                    'pais': 'Chile',
-                    'institucion': 'ISPCH'
-                })
+            entradas = await engine.parsear(parsear_feed, response.content, 'Chile', 'ISPCH', listado=url)
+            noticias_feed = filtrar_conocidas(entradas, urls_conocidas)
 
         except Exception as e:
             print(f"  -> [ERROR] Falló el scraping de CHILE - {subcategoria}: {e}")
+            engine.descartar(url)
             return []
 
+        return noticias_feed
+
+    # Los tres feeds se piden a la vez
+    resultados = await asyncio.gather(
+        *(scrape_feed(subcategoria, url) for subcategoria, url in url_chile.items())
+    )
+
+    noticias_chile = []
+    for noticias_feed in resultados:
+        noticias_chile.extend(noticias_feed)
+
     return noticias_chile
 
 ##### BRASIL :/
-def scrape_brasil():
+# Solo se construyen los nodos de los ítems del listado, no la página completa
+ITEMS_BRASIL = SoupStrainer('div', class_='row-fluid lista-noticias')
+
+def parsear_brasil(contenido):
+    noticias_brasil = []
+
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_BRASIL)
+    contenedores = soup.find_all('div', class_='row-fluid lista-noticias')
+
+    if not contenedores:
+        print(" -> [ADVERTENCIA] No se encontraron noticias (Estructura pudo cambiar).")
+        return []
+
+    for contenedor in contenedores:
+        link_tag = contenedor.select_one('div.titulo-resumo p.titulo a')
+        fecha_tag = contenedor.select_one('div.span3.data-hora p.data .icon-calendar')
+        hora_tag = contenedor.select_one('div.span3.data-hora p.hora .icon-time')
+
+        if link_tag and fecha_tag and link_tag.get('href'):
+            fecha_bruto = fecha_tag.parent.text.strip()
+            hora_bruto = hora_tag.parent.text.strip()
+            fecha_hora_bruto = f"{fecha_bruto} {hora_bruto}"
+
+            try:
+                fecha_dt = datetime.strptime(fecha_hora_bruto, '%d/%m/%Y %H:%M')
+                fecha_normalizada = fecha_dt.strftime('%d-%m-%Y %H:%M')
+            except ValueError:
+                fecha_normalizada = fecha_bruto
+
+            noticias_brasil.append(Alerta(
+                url=link_tag.get('href'),
+                titulo=link_tag.text.strip(),
+                fecha=fecha_normalizada,
+                pais='Brasil',
+                institucion='ANVISA'
+            ))
+    return noticias_brasil
+
+async def scrape_brasil(engine, urls_conocidas=frozenset()):
     print("  -> Scrapeando BRASIL - ANVISA...")
     url_brasil = "https://antigo.anvisa.gov.br/alertas"
-    noticias_brasil = []
 
     try:
-        response = requests.get(
-            url_brasil, 
-            impersonate="chrome110", 
-            timeout=30,
-            verify=False 
-        )
-        
+        response = await engine.get_condicional(url_brasil)
+        if response is None:
+            return []
+
         if response.status_code != 200:
             print(f" -> [ERROR] Status code: {response.status_code}")
             return []
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-        contenedores = soup.find_all('div', class_='row-fluid lista-noticias')
+        noticias_brasil = await engine.parsear(parsear_brasil, response.content, listado=url_brasil)
+        return filtrar_conocidas(noticias_brasil, urls_conocidas)
 
-        if not contenedores:
-            print(" -> [ADVERTENCIA] No se encontraron noticias (Estructura pudo cambiar).")
-            return []
+    except Exception as e:
+        print(f"[!] Error fatal en ANVISA: {e}")
+        return []
 
-        for contenedor in contenedores:
-            link_tag = contenedor.select_one('div.titulo-resumo p.titulo a')
-            fecha_tag = contenedor.select_one('div.span3.data-hora p.data .icon-calendar')
-            hora_tag = contenedor.select_one('div.span3.data-hora p.hora .icon-time')
+##### COLOMBIA :)
+ITEMS_COLOMBIA = SoupStrainer('div', class_='alertas-invima-list')
 
-            if link_tag and fecha_tag and link_tag.get('href'):
-                fecha_bruto = fecha_tag.parent.text.strip()
-                hora_bruto = hora_tag.parent.text.strip()
-                fecha_hora_bruto = f"{fecha_bruto} {hora_bruto}"
-                
-                try:
-                    fecha_dt = datetime.strptime(fecha_hora_bruto, '%d/%m/%Y %H:%M')
-                    fecha_normalizada = fecha_dt.strftime('%d-%m-%Y %H:%M')
-                except ValueError:
-                    fecha_normalizada = fecha_bruto
+def parsear_colombia(contenido):
+    noticias_colombia = []
 
-                noticias_brasil.append({
-                    'url': link_tag.get('href'),
-                    'titulo': link_tag.text.strip(),
-                    'fecha': fecha_normalizada,
-                    'pais': 'Brasil',
-                    'institucion': 'ANVISA'
-                })
-        return noticias_brasil
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_COLOMBIA)
+    contenedores = soup.find_all('div', class_='alertas-invima-list')
 
-    except Exception as e:
-        print(f"[!] Error fatal en ANVISA: {e}")
+    if not contenedores:
+        print("  -> [ERROR] No se encontró ningún contenedor de noticia (clase 'alertas-invima-list')")
         return []
 
-##### COLOMBIA :)
-def scrape_colombia():
+    for contenedor in contenedores:
+        titulo_tag = contenedor.select_one('div.views-field-title span.field-content')
+        fecha_tag = contenedor.select_one('div.views-field-field-a-o div.field-content')
+        link_tag = contenedor.select_one('span.views-field-field-comunicado-invima a')
+
+        if titulo_tag and fecha_tag and link_tag and link_tag.get('href'):
+            fecha_bruto = fecha_tag.text.strip()
+            fecha_normalizada = datetime.strptime(fecha_bruto, '%Y-%m-%d').strftime('%d-%m-%Y')
+
+            noticias_colombia.append(Alerta(
+                url=link_tag.get('href'),
+                titulo=titulo_tag.text.strip(),
+                fecha=fecha_normalizada,
+                pais='Colombia',
+                institucion='INVIMA'
+            ))
+    return noticias_colombia
+
+async def scrape_colombia(engine, urls_conocidas=frozenset()):
     ''' Extrae TODAS las alertas de la primera página del INVIMA de Colombia '''
     print("  -> Scrapeando COLOMBIA - INVIMA...")
     url_colombia = "https://app.invima.gov.co/alertas/alertas-sanitarias-general?field_tipo_de_documento_value=2&field_a_o_value=1"
-    noticias_colombia = []
-
-    try:       
-        response = requests.get(url_colombia, timeout=15,impersonate="chrome110")
-        response.raise_for_status() 
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-        contenedores = soup.find_all('div', class_='alertas-invima-list')
 
-        if not contenedores:
-            print("  -> [ERROR] No se encontró ningún contenedor de noticia (clase 'alertas-invima-list')")
+    try:
+        response = await engine.get_condicional(url_colombia)
+        if response is None:
             return []
+        response.raise_for_status()
 
-        for contenedor in contenedores:
-            titulo_tag = contenedor.select_one('div.views-field-title span.field-content')
-            fecha_tag = contenedor.select_one('div.views-field-field-a-o div.field-content')
-            link_tag = contenedor.select_one('span.views-field-field-comunicado-invima a')
-
-            if titulo_tag and fecha_tag and link_tag and link_tag.get('href'):
-                fecha_bruto = fecha_tag.text.strip()
-                fecha_normalizada = datetime.strptime(fecha_bruto, '%Y-%m-%d').strftime('%d-%m-%Y')
-
-                noticias_colombia.append({
-                    'url': link_tag.get('href'),
-                    'titulo': titulo_tag.text.strip(),
-                    'fecha': fecha_normalizada,
-                    'pais': 'Colombia',
-                    'institucion': 'INVIMA'
-                })
-        return noticias_colombia
+        noticias_colombia = await engine.parsear(parsear_colombia, response.content, listado=url_colombia)
+        return filtrar_conocidas(noticias_colombia, urls_conocidas)
 
     except Exception as e:
         print(f"[!] Error fatal en scraping de COLOMBIA - INVIMA: {e}")
         return []
 
 ##### MÉXICO :/
-def scrape_mexico():
+LIMITE_NOTICIAS_COFEPRIS = 10
+ITEMS_MEXICO = SoupStrainer('li', class_='clearfix documents')
+
+def parsear_mexico(contenido, categoria):
+    noticias_categoria = []
+
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_MEXICO)
+    contenedores = soup.find_all('li', class_='clearfix documents')
+    contenedores_recientes = contenedores[:LIMITE_NOTICIAS_COFEPRIS]
+
+    if not contenedores_recientes:
+        print(f"  -> [ERROR] No se encontraron contenedores en {categoria}.")
+        return []
+
+    # Iterar sobre los 10 más recientes de esta categoría
+    for contenedor in contenedores_recientes:
+
+        titulo_div = contenedor.select_one('div.col-md-10')
+        link_tag = contenedor.select_one('div.col-md-2 a')
+
+        if titulo_div and link_tag and link_tag.get('href'):
+
+            titulo_completo = titulo_div.text.strip()
+            fecha_normalizada = "Sin Fecha"
+
+            match = re.search(r'(\d{8})', titulo_completo)
+            if match:
+                fecha_str_ddmmyyyy = match.group(1)
+                try:
+                    fecha_dt = datetime.strptime(fecha_str_ddmmyyyy, '%d%m%Y')
+                    fecha_normalizada = fecha_dt.strftime('%d-%m-%Y')
+                except ValueError:
+                    fecha_normalizada = fecha_str_ddmmyyyy
+
+            titulo_sin_ext = titulo_completo.split('.pdf')[0]
+            if match:
+                # Intenta remover la fecha de 8 dígitos que encontró
+                titulo_limpio = titulo_sin_ext.replace(fecha_str_ddmmyyyy, '').strip('_').strip()
+            else:
+                titulo_limpio = titulo_sin_ext
+
+            enlace_completo = f"https://www.gob.mx{link_tag.get('href')}"
+
+            noticias_categoria.append(Alerta(
+                url=enlace_completo,
+                titulo=titulo_limpio,
+                fecha=fecha_normalizada,
+                pais='México',
+                institucion='COFEPRIS'
+            ))
+
+    return noticias_categoria
+
+async def scrape_mexico(engine, urls_conocidas=frozenset()):
     ''' Extrae las primeras 10 alertas de CADA CATEGORÍA de COFEPRIS y las consolida. '''
     print("  -> Scrapeando MÉXICO - COFEPRIS...")
     URL_BASE_COFEPRIS = "https://www.gob.mx/cofepris/documentos/alertas-sanitarias-de-"
-    LIMITE_NOTICIAS = 10 
 
     # 1. Definición de URLs por Categoría
     url_mexico_categorias = {
@@ -240,60 +375,36 @@ def scrape_mexico():
         "Bebidas Alcoholicas": f"{URL_BASE_COFEPRIS}bebidas-alcoholicas",
         "Suplementos Alimenticios": f"{URL_BASE_COFEPRIS}suplementos-alimenticios"
     }
-    
+
+    async def scrape_categoria(categoria, url):
+        # Una categoría caída no descarta las otras (ni cancela el sondeo del circuito del host)
+        try:
+            response = await engine.get_condicional(url)
+        except Exception as e:
+            print(f"    [!] No se pudo obtener {categoria}: {e}")
+            return []
+        if response is None:
+            return []
+        if response.status_code != 200:
+            print(f"    [!] Error {response.status_code} en {categoria}")
+            return []
+
+        try:
+            noticias_categoria = await engine.parsear(parsear_mexico, response.content, categoria, listado=url)
+        except Exception as e:
+            print(f"    [!] Error parseando {categoria}: {e}")
+            return []
+        return filtrar_conocidas(noticias_categoria, urls_conocidas)
+
     noticias_mexico = []
 
-    try:        
-        # Bucle para iterar sobre CADA categoría
-        for categoria, url in url_mexico_categorias.items():
-            
-            response = requests.get(url, timeout=20, impersonate="chrome110")
-            response.raise_for_status() 
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            contenedores = soup.find_all('li', class_='clearfix documents')            
-            contenedores_recientes = contenedores[:LIMITE_NOTICIAS] 
-
-            if not contenedores_recientes:
-                print(f"  -> [ERROR] No se encontraron contenedores en {categoria}.")
-                continue 
-
-            # Iterar sobre los 10 más recientes de esta categoría
-            for contenedor in contenedores_recientes:
-                
-                titulo_div = contenedor.select_one('div.col-md-10')
-                link_tag = contenedor.select_one('div.col-md-2 a')
-                
-                if titulo_div and link_tag and link_tag.get('href'):
-                    
-                    titulo_completo = titulo_div.text.strip()
-                    fecha_normalizada = "Sin Fecha"
-
-                    match = re.search(r'(\d{8})', titulo_completo)
-                    if match:
-                        fecha_str_ddmmyyyy = match.group(1)
-                        try:
-                            fecha_dt = datetime.strptime(fecha_str_ddmmyyyy, '%d%m%Y')
-                            fecha_normalizada = fecha_dt.strftime('%d-%m-%Y')
-                        except ValueError:
-                            fecha_normalizada = fecha_str_ddmmyyyy
-                    
-                    titulo_sin_ext = titulo_completo.split('.pdf')[0]
-                    if match:
-                        # Intenta remover la fecha de 8 dígitos que encontró
-                        titulo_limpio = titulo_sin_ext.replace(fecha_str_ddmmyyyy, '').strip('_').strip()
-                    else:
-                        titulo_limpio = titulo_sin_ext
-                        
-                    enlace_completo = f"https://www.gob.mx{link_tag.get('href')}" 
-                    
-                    noticias_mexico.append({
-                        'url': enlace_completo,
-                        'titulo': titulo_limpio,
-                        'fecha': fecha_normalizada,
-                        'pais': 'México',
-                        'institucion': 'COFEPRIS'
-                    })
+    try:
+        # Todas las categorías se piden a la vez
+        resultados = await asyncio.gather(
+            *(scrape_categoria(categoria, url) for categoria, url in url_mexico_categorias.items())
+        )
+        for noticias_categoria in resultados:
+            noticias_mexico.extend(noticias_categoria)
 
         return noticias_mexico
 
@@ -302,9 +413,47 @@ def scrape_mexico():
         return []
 
 ##### ARGENTINA :)
-def scrape_argentina():
+ITEMS_ARGENTINA = SoupStrainer('a', class_='panel panel-default')
+
+def parsear_argentina(contenido):
+    noticias_categoria = []
+
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_ARGENTINA)
+
+    # Selector clave: Buscamos las tarjetas de noticias (clase 'panel panel-default')
+    tarjetas = soup.find_all('a', class_='panel panel-default')
+
+    for tarjeta in tarjetas:
+        link_relativo = tarjeta.get('href')
+        link_absoluto = urljoin("https://www.argentina.gob.ar", link_relativo)
+
+        h3_tag = tarjeta.find('h3')
+        titulo = h3_tag.get_text(strip=True) if h3_tag else "Sin título"
+
+        time_tag = tarjeta.find('time')
+        fecha_norm = "Sin fecha"
+
+        if time_tag and time_tag.get('datetime'):
+            fecha_raw = time_tag.get('datetime')
+            try:
+                fecha_dt = datetime.strptime(fecha_raw, '%Y-%m-%d %H:%M:%S')
+                fecha_norm = fecha_dt.strftime('%d-%m-%Y %H:%M')
+            except ValueError:
+                fecha_norm = fecha_raw
+
+        noticias_categoria.append(Alerta(
+            url=link_absoluto,
+            titulo=titulo,
+            fecha=fecha_norm,
+            pais='Argentina',
+            institucion='ANMAT'
+        ))
+
+    return noticias_categoria
+
+async def scrape_argentina(engine, urls_conocidas=frozenset()):
     print("  -> Scrapeando ARGENTINA - ANMAT...")
-    
+
     urls_argentina = {
         'Medicamentos': 'https://www.argentina.gob.ar/anmat/alertas/medicamentos/noticias',
         'Alimentos': 'https://www.argentina.gob.ar/anmat/alertas/alimentos/noticias',
@@ -313,155 +462,203 @@ def scrape_argentina():
         'Domisanitarios': 'https://www.argentina.gob.ar/anmat/alertas/domisanitarios/noticias'
     }
 
-    noticias_argentina = []
-    
-    # Iteramos por cada categoría del diccionario
-    for categoria, url in urls_argentina.items():      
+    # Cada categoría se procesa como una corrutina; el motor escalona los requests al sitio (RITMO_POR_HOST)
+    async def scrape_categoria(categoria, url):
+        noticias_categoria = []
         try:
             # Petición con identidad de Chrome
-            response = requests.get(
-                url, 
-                impersonate="chrome110", 
-                timeout=20, 
-                verify=False
-            )
-            
+            response = await engine.get_condicional(url)
+            if response is None:
+                return noticias_categoria
+
             if response.status_code != 200:
                 print(f"    [!] Error {response.status_code} en {categoria}")
-                continue
+                return noticias_categoria
+
+            tarjetas = await engine.parsear(parsear_argentina, response.content, listado=url)
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Selector clave: Buscamos las tarjetas de noticias (clase 'panel panel-default')
-            tarjetas = soup.find_all('a', class_='panel panel-default')
-            
             if not tarjetas:
-                continue
+                return noticias_categoria
 
-            for tarjeta in tarjetas:
-                h3_tag = tarjeta.find('h3')
-                titulo = h3_tag.get_text(strip=True) if h3_tag else "Sin título"
-                
-                link_relativo = tarjeta.get('href')
-                link_absoluto = urljoin("https://www.argentina.gob.ar", link_relativo)
-                
-                time_tag = tarjeta.find('time')
-                fecha_norm = "Sin fecha"
-                
-                if time_tag and time_tag.get('datetime'):
-                    fecha_raw = time_tag.get('datetime')
-                    try:
-                        fecha_dt = datetime.strptime(fecha_raw, '%Y-%m-%d %H:%M:%S')
-                        fecha_norm = fecha_dt.strftime('%d-%m-%Y %H:%M')
-                    except ValueError:
-                        fecha_norm = fecha_raw
-                
-                noticias_argentina.append({
-                    'url': link_absoluto,
-                    'titulo': titulo,
-                    'fecha': fecha_norm,
-                    'pais': 'Argentina',
-                    'institucion': 'ANMAT'
-                })
-            
-            time.sleep(1)
+            noticias_categoria = filtrar_conocidas(tarjetas, urls_conocidas)
 
         except Exception as e:
             print(f"    [!] Error crítico en {categoria}: {e}")
 
+        return noticias_categoria
+
+    resultados = await asyncio.gather(
+        *(scrape_categoria(categoria, url) for categoria, url in urls_argentina.items())
+    )
+
+    noticias_argentina = []
+    for noticias_categoria in resultados:
+        noticias_argentina.extend(noticias_categoria)
+
     return noticias_argentina
 
 ##### BOLIVIA :/
-def scrape_bolivia():
+ITEMS_BOLIVIA = SoupStrainer('tr')
+
+def parsear_bolivia(contenido, anio_actual):
+    url_base_files = "https://www.agemed.gob.bo/"
+    noticias_categoria = []
+
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_BOLIVIA)
+
+    filas = soup.find_all('tr')
+
+    for fila in filas:
+        cols = fila.find_all('td')
+
+        # Validamos que sea una fila de datos (mínimo 4 columnas según tu estructura)
+        # Estructura: [0] Alerta N°, [1] Descripción, [2] Fecha, [3] Botón Ver
+        if len(cols) >= 4:
+            # 1. Extracción de Fecha y Filtro
+            fecha_texto = cols[2].get_text(strip=True)
+
+            try:
+                # Formato observado: 01/12/2025
+                fecha_dt = datetime.strptime(fecha_texto, '%d/%m/%Y')
+
+                # FILTRO ESTRICTO: Solo año actual
+                if fecha_dt.year != anio_actual:
+                    continue
+
+                fecha_norm = fecha_dt.strftime('%d-%m-%Y')
+
+            except ValueError:
+                # Si falla es porque es un encabezado o fila vacía
+                continue
+
+            # 2. Extracción de Datos
+            identificador = cols[0].get_text(strip=True)
+            descripcion = cols[1].get_text(strip=True)
+            titulo_full = f"{identificador} - {descripcion}"
+
+            # 3. Extracción de Link PDF
+            tag_a = cols[3].find('a')
+            link_pdf = None
+            if tag_a and tag_a.get('href'):
+                # Unimos la base "www.agemed" con la ruta relativa "archivo_farmacovigi/..."
+                link_pdf = urljoin(url_base_files, tag_a['href'])
+
+            noticias_categoria.append(Alerta(
+                titulo=titulo_full,
+                fecha=fecha_norm,
+                url=link_pdf,
+                pais='Bolivia',
+                institucion='AGEMED'
+            ))
+
+    return noticias_categoria
+
+async def scrape_bolivia(engine, urls_conocidas=frozenset()):
     print(" -> Scrapeando BOLIVIA - AGEMED...")
-    
+
     urls_fragmentos = {
         'Vigilancia y Control': 'https://apiwww.agemed.gob.bo/api/web/vigilanciacontrol%7Ccontenido',
         'Seguridad (DTU)': 'https://apiwww.agemed.gob.bo/api/web/dtu%7Ccontenido'
     }
 
-    url_base_files = "https://www.agemed.gob.bo/"
-    
-    noticias_bolivia = []
-    anio_actual = datetime.now().year 
+    anio_actual = datetime.now().year
 
-    for categoria, url in urls_fragmentos.items():
+    async def scrape_categoria(categoria, url):
+        noticias_categoria = []
         try:
-            
-            response = requests.get(
-                url, 
-                impersonate="chrome110", 
-                timeout=20, 
-                verify=False
-            )
-            
+
+            response = await engine.get_condicional(url)
+            if response is None:
+                return noticias_categoria
+
             if response.status_code != 200:
                 print(f"    [!] Error {response.status_code} al obtener fragmento.")
-                continue
+                return noticias_categoria
+
+            noticias_categoria = await engine.parsear(parsear_bolivia, response.content, anio_actual, listado=url)
+
+            # La tabla no garantiza orden por fecha: solo se omiten las ya conocidas
+            noticias_categoria = filtrar_conocidas(noticias_categoria, urls_conocidas, ordenadas=False)
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            filas = soup.find_all('tr')
-            
-            for fila in filas:
-                cols = fila.find_all('td')
-                
-                # Validamos que sea una fila de datos (mínimo 4 columnas según tu estructura)
-                # Estructura: [0] Alerta N°, [1] Descripción, [2] Fecha, [3] Botón Ver
-                if len(cols) >= 4:
-                    # 1. Extracción de Fecha y Filtro
-                    fecha_texto = cols[2].get_text(strip=True)
-                    
-                    try:
-                        # Formato observado: 01/12/2025
-                        fecha_dt = datetime.strptime(fecha_texto, '%d/%m/%Y')
-                        
-                        # FILTRO ESTRICTO: Solo año actual
-                        if fecha_dt.year != anio_actual:
-                            continue
-                            
-                        fecha_norm = fecha_dt.strftime('%d-%m-%Y')
-                        
-                    except ValueError:
-                        # Si falla es porque es un encabezado o fila vacía
-                        continue
-
-                    # 2. Extracción de Datos
-                    identificador = cols[0].get_text(strip=True)
-                    descripcion = cols[1].get_text(strip=True)
-                    titulo_full = f"{identificador} - {descripcion}"
-                    
-                    # 3. Extracción de Link PDF
-                    tag_a = cols[3].find('a')
-                    link_pdf = None
-                    if tag_a and tag_a.get('href'):
-                        # Unimos la base "www.agemed" con la ruta relativa "archivo_farmacovigi/..."
-                        link_pdf = urljoin(url_base_files, tag_a['href'])
-
-                    noticias_bolivia.append({
-                        'titulo': titulo_full,
-                        'fecha': fecha_norm,
-                        'url': link_pdf,
-                        'pais': 'Bolivia',
-                        'institucion': 'AGEMED'
-                    })
-                    
         except Exception as e:
             print(f"    [!] Error en {categoria}: {e}")
 
-    unicos = {n['url']: n for n in noticias_bolivia if n['url']}.values()
+        return noticias_categoria
+
+    resultados = await asyncio.gather(
+        *(scrape_categoria(categoria, url) for categoria, url in urls_fragmentos.items())
+    )
+
+    noticias_bolivia = []
+    for noticias_categoria in resultados:
+        noticias_bolivia.extend(noticias_categoria)
+
+    unicos = {n.url: n for n in noticias_bolivia if n.url}.values()
 
     return list(unicos)
 
 ## Página de mrd la de venezuela, no hay nada en su huevada
 
 ##### COSTA RICA :)
-def scrape_costarica():
+ITEMS_COSTARICA = SoupStrainer('tr', class_='docman_item')
+
+def parsear_costarica(contenido, categoria, anio_actual):
+    url_base = "https://www.ministeriodesalud.go.cr"
+    patron_fecha_inicio = r'^\d{1,2}\s+de\s+[a-zA-Záéíóú]+\s+(?:de\s+\d{4})?[.\-]?\s*'
+    noticias_categoria = []
+
+    soup = BeautifulSoup(contenido, PARSER_HTML, parse_only=ITEMS_COSTARICA)
+    items = soup.find_all('tr', class_='docman_item')
+
+    if not items:
+        print(f"    [ADVERTENCIA] No hay documentos aún en {categoria}")
+        return noticias_categoria
+
+    for item in items:
+        tag_a = item.find('a', class_='docman_track_download')
+        if not tag_a: continue
+
+        titulo_sucio = tag_a.get('data-title', 'Sin título').strip()
+
+        titulo_limpio = re.sub(patron_fecha_inicio, '', titulo_sucio, flags=re.IGNORECASE).strip()
+        titulo_limpio = titulo_limpio.capitalize()
+
+        tag_time = item.find('time', itemprop='datePublished')
+        fecha_norm = "Sin fecha"
+
+        if tag_time and tag_time.get('datetime'):
+            fecha_raw = tag_time.get('datetime')
+            try:
+                fecha_dt = datetime.strptime(fecha_raw, '%Y-%m-%d %H:%M:%S')
+
+                # Filtro estricto de año
+                if fecha_dt.year != anio_actual:
+                    continue
+
+                fecha_norm = fecha_dt.strftime('%d-%m-%Y %H:%M')
+            except ValueError:
+                fecha_norm = fecha_raw
+
+        # Enlace
+        link_relativo = tag_a.get('href')
+        link_pdf = urljoin(url_base, link_relativo) if link_relativo else None
+
+        noticias_categoria.append(Alerta(
+            titulo=titulo_limpio,
+            fecha=fecha_norm,
+            url=link_pdf,
+            pais='Costa Rica',
+            institucion='MinSalud'
+        ))
+
+    return noticias_categoria
+
+async def scrape_costarica(engine, urls_conocidas=frozenset()):
     """
     Scrapea alertas de Costa Rica
     """
     print(" -> Scrapeando COSTA RICA...")
-    
+
     # 1. Obtener año actual dinámicamente
     anio_actual = datetime.now().year
 
@@ -472,77 +669,38 @@ def scrape_costarica():
         'Farmacovigilancia': f'https://www.ministeriodesalud.go.cr/index.php/biblioteca-de-archivos-left/documentos-ministerio-de-salud/alertas-sanitarias/alertas-farmacovigilancia/advertencias-farmacovigilancia-{anio_actual}'
     }
 
-    url_base = "https://www.ministeriodesalud.go.cr"
-    noticias_cr = []
-
-    patron_fecha_inicio = r'^\d{1,2}\s+de\s+[a-zA-Záéíóú]+\s+(?:de\s+\d{4})?[.\-]?\s*'
-
-    for categoria, url in urls_costarica.items():
-        
+    async def scrape_categoria(categoria, url):
+        noticias_categoria = []
         try:
-            response = requests.get(
-                url, 
-                impersonate="chrome110", 
-                timeout=20, 
-                verify=False
-            )
-            
+            response = await engine.get_condicional(url)
+            if response is None:
+                return noticias_categoria
+
             if response.status_code == 404:
                 print(f"    [AVISO] La URL para el año {anio_actual} aún no existe o cambió.")
-                continue
+                return noticias_categoria
             elif response.status_code != 200:
                 print(f"    [!] Error {response.status_code}")
-                continue
+                return noticias_categoria
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            items = soup.find_all('tr', class_='docman_item')
-
-            if not items:
-                print(f"    [ADVERTENCIA] No hay documentos aún en {categoria}")
-                continue
+            noticias_categoria = await engine.parsear(parsear_costarica, response.content, categoria, anio_actual, listado=url)
 
-            for item in items:
-                tag_a = item.find('a', class_='docman_track_download')
-                if not tag_a: continue
-
-                titulo_sucio = tag_a.get('data-title', 'Sin título').strip()
-            
-                titulo_limpio = re.sub(patron_fecha_inicio, '', titulo_sucio, flags=re.IGNORECASE).strip()
-                titulo_limpio = titulo_limpio.capitalize()
-
-                tag_time = item.find('time', itemprop='datePublished')
-                fecha_norm = "Sin fecha"
-                
-                if tag_time and tag_time.get('datetime'):
-                    fecha_raw = tag_time.get('datetime')
-                    try:
-                        fecha_dt = datetime.strptime(fecha_raw, '%Y-%m-%d %H:%M:%S')
-                        
-                        # Filtro estricto de año
-                        if fecha_dt.year != anio_actual:
-                            continue
-                        
-                        fecha_norm = fecha_dt.strftime('%d-%m-%Y %H:%M')
-                    except ValueError:
-                        fecha_norm = fecha_raw
-
-                # Enlace
-                link_relativo = tag_a.get('href')
-                link_pdf = urljoin(url_base, link_relativo) if link_relativo else None
-
-                noticias_cr.append({
-                    'titulo': titulo_limpio,
-                    'fecha': fecha_norm,
-                    'url': link_pdf,
-                    'pais': 'Costa Rica',
-                    'institucion': 'MinSalud'
-                })
-            
-            time.sleep(1)
+            # Los documentos del docman no vienen ordenados por fecha: solo se omiten los conocidos
+            noticias_categoria = filtrar_conocidas(noticias_categoria, urls_conocidas, ordenadas=False)
 
         except Exception as e:
             print(f"    [!] Error en {categoria}: {e}")
 
-    unicos = {n['url']: n for n in noticias_cr if n['url']}.values()
-    
+        return noticias_categoria
+
+    resultados = await asyncio.gather(
+        *(scrape_categoria(categoria, url) for categoria, url in urls_costarica.items())
+    )
+
+    noticias_cr = []
+    for noticias_categoria in resultados:
+        noticias_cr.extend(noticias_categoria)
+
+    unicos = {n.url: n for n in noticias_cr if n.url}.values()
+
     return list(unicos)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from data_dir import DIR_DATOS
+
+ARCHIVO_CACHE_RESUMENES = os.path.join(DIR_DATOS, 'cache_resumenes.db')
+
+# Límite de entradas: al superarlo se descartan las menos usadas recientemente (LRU)
+MAX_ENTRADAS = 5000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resumenes (
+    clave TEXT PRIMARY KEY,
+    resumen TEXT NOT NULL,
+    ultimo_uso REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resumenes_ultimo_uso ON resumenes(ultimo_uso);
+"""
+
+def normalizar(texto):
+    """Colapsa espacios y saltos de línea para que variantes triviales del mismo texto compartan clave"""
+    return ' '.join(texto.split())
+
+class CacheResumenes:
+    """
+    Cache persistente de resúmenes indexado por el hash del texto normalizado y la versión del prompt.
+
+    La versión (modelo + instrucciones) forma parte de la clave: si cambia el prompt, las entradas
+    viejas dejan de coincidir y terminan saliendo por LRU. Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, version, ruta=ARCHIVO_CACHE_RESUMENES, max_entradas=MAX_ENTRADAS):
+        self.version = version
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(ESQUEMA)
+
+    def clave(self, texto):
+        contenido = f"{self.version}\n{normalizar(texto)}"
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def obtener(self, texto):
+        """Devuelve el resumen guardado para el texto, o None si no está"""
+        clave = self.clave(texto)
+        with self._lock:
+            fila = self.conn.execute("SELECT resumen FROM resumenes WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE resumenes SET ultimo_uso = ? WHERE clave = ?", (time.time(), clave))
+        return fila[0]
+
+    def guardar(self, texto, resumen):
+        """Guarda un resumen y aplica el límite de entradas"""
+        clave = self.clave(texto)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO resumenes (clave, resumen, ultimo_uso) VALUES (?, ?, ?)",
+                (clave, resumen, time.time())
+            )
+            self.conn.execute(
+                "DELETE FROM resumenes WHERE clave IN ("
+                "SELECT clave FROM resumenes ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,)
+            )
+
+    def cerrar(self):
+        with self._lock:
+            self.conn.close()
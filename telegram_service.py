@@ -0,0 +1,219 @@
+import collections
+import os
+import queue
+import threading
+import time
+import requests
+import metrics
+
+URL_API_TELEGRAM = os.environ.get('URL_API_TELEGRAM', "https://api.telegram.org")
+
+# Límites de Telegram por chat: ~1 mensaje por segundo y 20 por minuto en grupos
+INTERVALO_MINIMO_SEGUNDOS = 1.0
+MAX_MENSAJES_POR_MINUTO = 20
+TIMEOUT_SEGUNDOS = 15
+MAX_REINTENTOS = 5
+
+# Agrupación de alertas cuando la cola supera lo que se puede enviar en un minuto
+AGRUPAR_EN_RAFAGAS = os.environ.get('TELEGRAM_AGRUPAR', '1') == '1'
+LARGO_MAXIMO_MENSAJE = 4096
+SEPARADOR_AGRUPADO = "\n\n➖➖➖➖➖\n\n"
+
+class EmisorTelegram:
+    """
+    Cola de envíos a Telegram con una sesión HTTP reutilizada y un hilo propio que:
+    - espacia los mensajes según los límites por chat,
+    - respeta el retry_after de las respuestas 429 y reintenta sin perder alertas,
+    - agrupa varias alertas en un mensaje si la ráfaga supera la tasa permitida,
+    - con un plazo de vaciado, devuelve lo que no llegó a enviarse (o falló tras los reintentos)
+      en vez de bloquear el run o darlo por enviado.
+    """
+
+    def __init__(self, token, chat_id, agrupar=AGRUPAR_EN_RAFAGAS, al_enviar=None):
+        self.url = f"{URL_API_TELEGRAM}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.agrupar = agrupar
+        # Función opcional [referencias] -> None, llamada desde el hilo emisor tras cada envío exitoso
+        self.al_enviar = al_enviar
+        self.session = requests.Session()
+        self.enviados = 0
+        self.fallidos = 0
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._envios_recientes = collections.deque()
+        self._detener = threading.Event()
+        self._no_enviados = []
+        self._fallidas = []
+
+    def encolar(self, mensaje, referencia=None):
+        """
+        Agrega un mensaje a la cola; el hilo emisor arranca con el primer mensaje
+
+        Args:
+            mensaje: Texto HTML del mensaje
+            referencia: Objeto asociado (p. ej. la alerta) que vaciar() devuelve si no se envió
+        """
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._procesar_cola, daemon=True)
+            self._hilo.start()
+        self._cola.put((mensaje, referencia))
+
+    def vaciar(self, plazo=None):
+        """
+        Espera a que se envíen todos los mensajes encolados, como mucho `plazo` segundos.
+        Vencido el plazo el hilo termina tras el request en curso y lo que quedaba en cola
+        (o a medio reintentar) no se envía.
+
+        Returns:
+            list: Referencias de los mensajes que no se enviaron, por el plazo o porque fallaron
+                tras los reintentos
+        """
+        if self._hilo is None:
+            return []
+        self._cola.put(None)
+        self._hilo.join(plazo)
+        if self._hilo.is_alive():
+            self._detener.set()
+            self._hilo.join()
+        self._hilo = None
+
+        while True:
+            try:
+                item = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._no_enviados.append(item[1])
+
+        no_enviados, self._no_enviados = self._no_enviados, []
+        fallidas, self._fallidas = self._fallidas, []
+        if no_enviados:
+            print(f"  > Plazo de envío vencido: {len(no_enviados)} alertas quedan sin enviar")
+        if fallidas:
+            print(f"  > Envío fallido: {len(fallidas)} alertas quedan para reintentar")
+        return no_enviados + fallidas
+
+    def _procesar_cola(self):
+        while not self._detener.is_set():
+            item = self._cola.get()
+            if item is None:
+                break
+            mensaje, referencias = item[0], [item[1]]
+
+            terminar = False
+            if self.agrupar and self._cola.qsize() >= MAX_MENSAJES_POR_MINUTO:
+                mensaje, referencias, terminar = self._agrupar(mensaje, referencias)
+
+            enviado = self._enviar(mensaje) if self._esperar_turno() else None
+            if enviado is None:
+                # Se detuvo por el plazo antes de poder enviarlo
+                self._no_enviados.extend(referencias)
+                break
+            if enviado:
+                self._confirmar(referencias)
+            else:
+                self._fallidas.extend(referencia for referencia in referencias if referencia is not None)
+
+            if terminar:
+                break
+
+    def _agrupar(self, mensaje, referencias):
+        """Une mensajes de la cola mientras quepan en un solo mensaje de Telegram"""
+        partes = [mensaje]
+        largo = len(mensaje)
+        terminar = False
+        while True:
+            try:
+                siguiente = self._cola.queue[0]
+            except IndexError:
+                break
+            if siguiente is None:
+                self._cola.get_nowait()
+                terminar = True
+                break
+            if largo + len(SEPARADOR_AGRUPADO) + len(siguiente[0]) > LARGO_MAXIMO_MENSAJE:
+                break
+            parte, referencia = self._cola.get_nowait()
+            partes.append(parte)
+            referencias.append(referencia)
+            largo += len(SEPARADOR_AGRUPADO) + len(parte)
+
+        if len(partes) > 1:
+            print(f"  > Ráfaga de alertas: {len(partes)} agrupadas en un mensaje")
+        return SEPARADOR_AGRUPADO.join(partes), referencias, terminar
+
+    def _confirmar(self, referencias):
+        referencias = [referencia for referencia in referencias if referencia is not None]
+        if self.al_enviar is None or not referencias:
+            return
+        try:
+            self.al_enviar(referencias)
+        except Exception as e:
+            print(f"  > Error registrando el envío: {e}")
+
+    def _esperar_turno(self):
+        """
+        Respeta el intervalo mínimo entre mensajes y el máximo por minuto
+
+        Returns:
+            bool: False si se pidió detener el hilo durante la espera
+        """
+        ahora = time.monotonic()
+        while self._envios_recientes and ahora - self._envios_recientes[0] > 60:
+            self._envios_recientes.popleft()
+
+        espera = 0.0
+        if self._envios_recientes:
+            espera = INTERVALO_MINIMO_SEGUNDOS - (ahora - self._envios_recientes[-1])
+        if len(self._envios_recientes) >= MAX_MENSAJES_POR_MINUTO:
+            espera = max(espera, 60 - (ahora - self._envios_recientes[0]))
+        if espera > 0:
+            return not self._detener.wait(espera)
+        return not self._detener.is_set()
+
+    def _enviar(self, mensaje):
+        """
+        Returns:
+            bool | None: True si se envió, False si falló, None si se detuvo antes de lograrlo
+        """
+        data = {"chat_id": self.chat_id, "text": mensaje, "parse_mode": "HTML", "disable_web_page_preview": True}
+
+        for intento in range(MAX_REINTENTOS + 1):
+            try:
+                with metrics.span('http', host='api.telegram.org', tipo='telegram') as span:
+                    response = self.session.post(self.url, data=data, timeout=TIMEOUT_SEGUNDOS)
+                    span.etiquetas['status'] = response.status_code
+                    span.datos['bytes'] = len(data['text'].encode('utf-8'))
+                self._envios_recientes.append(time.monotonic())
+
+                if response.status_code == 200:
+                    self.enviados += 1
+                    metrics.contar('telegram_mensajes', resultado='enviado')
+                    print(f"  > Enviado a {self.chat_id}")
+                    return True
+
+                if response.status_code == 429:
+                    # Telegram indica cuántos segundos esperar antes de volver a enviar
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                    metrics.contar('telegram_429')
+                    print(f"  > Límite de Telegram alcanzado, reintentando en {retry_after}s...")
+                    if self._detener.wait(retry_after):
+                        return None
+                    continue
+
+                if response.status_code < 500:
+                    # Errores del cliente (mensaje inválido, chat inexistente): reintentar no sirve
+                    print(f"  > Error {response.status_code} enviando a {self.chat_id}: {response.text[:200]}")
+                    break
+
+                print(f"  > Error {response.status_code} de Telegram, reintentando...")
+            except Exception as e:
+                print(f"  > Error enviando a {self.chat_id}: {e}")
+
+            if self._detener.wait(min(2 ** intento, 30)):
+                return None
+
+        self.fallidos += 1
+        metrics.contar('telegram_mensajes', resultado='fallido')
+        return False